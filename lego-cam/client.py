@@ -1,32 +1,229 @@
+import argparse
 import cv2
-import numpy as np
 import socket
-import struct
-from io import BytesIO
+import threading
+import time
 
-# Capture frame
-cap = cv2.VideoCapture(0)
+from protocol import DEFAULT_CAMERA_ID, encode_frame, encode_hello, recv_control
 
-# Set desired frame rate (FPS)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1024)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 768)
-cap.set(cv2.CAP_PROP_FPS, 30)
 
-client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-client_socket.connect(('192.168.0.50', 8080))
+class LatestFrame:
+    """One-slot handoff between capture and send: a newer frame replaces an unsent one."""
 
-while cap.isOpened():
-    _, frame = cap.read()
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.frame = None
+        self.captured_at = 0.0
+        self.sequence = 0
+        self.dropped = 0
 
-    memfile = BytesIO()
-    np.save(memfile, frame)
-    memfile.seek(0)
-    data = memfile.read()
+    def put(self, frame, captured_at):
+        with self.cond:
+            if self.frame is not None:
+                self.dropped += 1
+            self.frame = frame
+            self.captured_at = captured_at
+            self.sequence += 1
+            self.cond.notify()
 
-    # Send form byte array: frame size + frame content
-    client_socket.sendall(struct.pack("L", len(data)) + data)
+    def take(self, timeout=1.0):
+        with self.cond:
+            if self.frame is None:
+                self.cond.wait(timeout)
+            frame, captured_at = self.frame, self.captured_at
+            self.frame = None
+            return frame, captured_at
 
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-cap.release()
+# Lowest capture rate a control message can set
+MIN_FPS = 0.5
+
+
+class CaptureSettings:
+    """Capture rate and resolution scale, adjusted by the server over the control channel."""
+
+    def __init__(self, fps):
+        self.lock = threading.Lock()
+        self.max_fps = fps
+        self.fps = fps
+        self.scale = 1.0
+
+    def update(self, control):
+        with self.lock:
+            self.fps = min(max(float(control.get('fps', self.max_fps)), MIN_FPS), self.max_fps)
+            self.scale = min(max(float(control.get('scale', 1.0)), 0.05), 1.0)
+        print(f'Server requested {self.fps:g} fps at scale {self.scale:g}')
+
+
+class Stats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.captured = 0
+        self.sent = 0
+        self.skipped = 0
+        self.lag_total = 0.0
+        self.started = time.monotonic()
+
+    def report(self, slot):
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            lag = self.lag_total / self.sent * 1000 if self.sent else 0.0
+            print(f'capture {self.captured / elapsed:.1f} fps | send {self.sent / elapsed:.1f} fps | '
+                  f'lag {lag:.0f} ms | replaced {slot.dropped} | skipped {self.skipped}')
+            self.captured = self.sent = self.skipped = 0
+            self.lag_total = 0.0
+            slot.dropped = 0
+            self.started = time.monotonic()
+
+
+def capture_loop(cap, slot, stats, stop, settings):
+    next_due = 0.0
+    retry_delay = 0.01
+    while not stop.is_set() and cap.isOpened():
+        now = time.monotonic()
+        if now < next_due:
+            # Keep the driver queue fresh without decoding frames nobody asked for
+            if cap.grab():
+                retry_delay = 0.01
+                continue
+        else:
+            next_due = now + 1.0 / settings.fps
+            ok, frame = cap.read()
+            if ok:
+                retry_delay = 0.01
+                slot.put(frame, time.monotonic())
+                with stats.lock:
+                    stats.captured += 1
+                continue
+
+        # Back off while the camera keeps failing instead of spinning on grab() or read()
+        stop.wait(retry_delay)
+        retry_delay = min(retry_delay * 2, 1.0)
+    stop.set()
+
+
+def control_loop(client_socket, settings):
+    """Apply control messages from the server until the connection closes."""
+    try:
+        while True:
+            control = recv_control(client_socket)
+            if control is None:
+                break
+            settings.update(control)
+    except (OSError, ValueError):
+        pass
+
+
+def connect(host, port, camera_id, sndbuf, hello):
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    # Keep the kernel send buffer small so stale frames do not queue up behind a slow link
+    client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+    client_socket.connect((host, port))
+    client_socket.sendall(encode_hello(camera_id, **hello))
+    return client_socket
+
+
+def send_loop(args, hello, slot, stats, stop, settings):
+    client_socket = None
+    backoff = 0.5
+
+    while not stop.is_set():
+        if client_socket is None:
+            try:
+                client_socket = connect(args.host, args.port, args.camera_id, hello['width'] * hello['height'] * 3, hello)
+                print(f'Connected to {args.host}:{args.port} as camera {args.camera_id}')
+                threading.Thread(target=control_loop, args=(client_socket, settings), daemon=True).start()
+                backoff = 0.5
+            except OSError as e:
+                print(f'Connect failed: {e}, retrying in {backoff:.1f}s')
+                stop.wait(backoff)
+                backoff = min(backoff * 2, 10.0)
+                continue
+
+        frame, captured_at = slot.take()
+        if frame is None:
+            continue
+
+        # Under backpressure the frame may already be too old to be worth sending
+        if args.max_lag and time.monotonic() - captured_at > args.max_lag:
+            with stats.lock:
+                stats.skipped += 1
+            continue
+
+        scale = settings.scale
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        try:
+            # Send form byte array: frame size + frame content
+            client_socket.sendall(encode_frame(frame))
+        except OSError as e:
+            # Reconnect and carry on with the next frame
+            print(f'Send failed: {e}')
+            client_socket.close()
+            client_socket = None
+            continue
+
+        with stats.lock:
+            stats.sent += 1
+            stats.lag_total += time.monotonic() - captured_at
+
+    if client_socket is not None:
+        client_socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream camera frames to the lego-cam server')
+    parser.add_argument('--host', default='192.168.0.50')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--camera-id', default=DEFAULT_CAMERA_ID, help='camera name sent in the handshake')
+    parser.add_argument('--camera', type=int, default=0)
+    parser.add_argument('--width', type=int, default=1024)
+    parser.add_argument('--height', type=int, default=768)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--max-lag', type=float, default=0.0,
+                        help='skip frames older than this many seconds when sending (0 = never skip)')
+    parser.add_argument('--stats-interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    # Capture frame
+    cap = cv2.VideoCapture(args.camera)
+
+    # Set desired frame rate (FPS)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, args.width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, args.height)
+    cap.set(cv2.CAP_PROP_FPS, args.fps)
+    # Announce what the camera actually delivers; it may not honor the requested size
+    hello = {
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or args.width,
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or args.height,
+        'fps': args.fps,
+    }
+
+    slot = LatestFrame()
+    stats = Stats()
+    stop = threading.Event()
+    settings = CaptureSettings(args.fps)
+
+    threads = [
+        threading.Thread(target=capture_loop, args=(cap, slot, stats, stop, settings), daemon=True),
+        threading.Thread(target=send_loop, args=(args, hello, slot, stats, stop, settings), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while not stop.wait(args.stats_interval):
+            stats.report(slot)
+    except KeyboardInterrupt:
+        stop.set()
+
+    for thread in threads:
+        thread.join(timeout=2)
+    cap.release()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Demand-driven capture rate and resolution.
+
+Tracks who is consuming each camera (MJPEG viewers, long-polls, recent photo
+requests) and tells the camera clients over the control channel to capture at
+full rate and resolution only while somebody needs it. Otherwise they drop to a
+low idle rate at reduced resolution, which keeps Wi-Fi bandwidth and CPU free
+for the BLE and voice traffic.
+"""
+
+import contextlib
+import threading
+import time
+
+
+class DemandController(threading.Thread):
+
+    def __init__(self, streamer, idle_fps=1.0, idle_scale=0.5, burst_seconds=10.0, primary_idle=None):
+        threading.Thread.__init__(self, daemon=True)
+
+        self.streamer = streamer
+        self.idle_mode = {'fps': idle_fps, 'scale': idle_scale}
+        # Idle mode of the primary camera when on-server consumers (e.g. edge detection) need more
+        self.primary_idle = primary_idle
+        self.burst_seconds = burst_seconds
+        self.running = False
+
+        self.cond = threading.Condition()
+        self.consumers = {}
+        self.burst_until = {}
+
+    def _key(self, camera_id):
+        return camera_id if camera_id is not None else self.streamer.primary_camera
+
+    @contextlib.contextmanager
+    def acquire(self, camera_id=None):
+        """Hold full rate for a camera while a streaming consumer or long-poll is active."""
+        key = self._key(camera_id)
+        with self.cond:
+            self.consumers[key] = self.consumers.get(key, 0) + 1
+            self.cond.notify_all()
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.consumers[key] -= 1
+                self.cond.notify_all()
+
+    def touch(self, camera_id=None, seconds=None):
+        """Burst to full rate for a while, e.g. after a photo request."""
+        key = self._key(camera_id)
+        with self.cond:
+            self.burst_until[key] = time.monotonic() + (seconds or self.burst_seconds)
+            self.cond.notify_all()
+
+    def is_active(self, camera_id):
+        with self.cond:
+            return (self.consumers.get(camera_id, 0) > 0
+                    or self.burst_until.get(camera_id, 0) > time.monotonic())
+
+    def desired_mode(self, source):
+        if self.is_active(source.camera_id):
+            return {'fps': source.info.get('fps', 30), 'scale': 1.0}
+        if self.primary_idle is not None and source.camera_id == self.streamer.primary_camera:
+            return self.primary_idle
+        return self.idle_mode
+
+    def run(self):
+        self.running = True
+        while self.running:
+            with self.streamer.lock:
+                sources = list(self.streamer.sources.values())
+
+            for source in sources:
+                mode = self.desired_mode(source)
+                if source.conn is not None and source.mode != mode:
+                    source.send_control(mode)
+
+            # Re-evaluate on every demand change, and regularly for expiring bursts
+            with self.cond:
+                self.cond.wait(0.5)
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
@@ -0,0 +1,199 @@
+"""
+Shared-memory ring of raw camera frames.
+
+The streamer publishes every decoded frame into a ``multiprocessing.shared_memory``
+block so that a process on the same host (e.g. object detection) can read the
+latest frame without going through JPEG encode, HTTP, disk and JPEG decode.
+
+Layout of the shared block::
+
+    ring header  | magic, version, slot count, slot size, latest sequence, owner pid
+    slot 0       | slot header (sequence, timestamp, shape, dtype) + pixel data
+    slot 1       | ...
+
+Each slot header is written seqlock-style: the writer zeroes the slot sequence,
+copies the pixels and then stores the new sequence, so a reader can tell whether
+the slot it looked at was overwritten while it was using it.
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy
+
+DEFAULT_NAME = 'lego-cam-frames'
+DEFAULT_SLOTS = 4
+DEFAULT_SLOT_SIZE = 1024 * 768 * 3
+
+_MAGIC = b'LCFR'
+_VERSION = 2
+
+# magic, version, slots, slot_size, latest sequence, pid of the creating process
+_RING_HEADER = struct.Struct('<4sIIQQI')
+# sequence, timestamp, height, width, channels, dtype, nbytes
+_SLOT_HEADER = struct.Struct('<QdIII8sQ')
+_RING_HEADER_SIZE = 64
+_SLOT_DATA_OFFSET = 64
+
+_LATEST_OFFSET = struct.calcsize('<4sIIQ')
+
+
+class FrameHeader:
+
+    def __init__(self, sequence, timestamp, shape, dtype, nbytes):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.shape = shape
+        self.dtype = dtype
+        self.nbytes = nbytes
+
+    @property
+    def age(self):
+        """Seconds since the frame was published."""
+        return time.time() - self.timestamp
+
+
+class FrameRingWriter:
+    """Publishes frames into a named shared-memory ring (single writer)."""
+
+    def __init__(self, name=DEFAULT_NAME, slots=DEFAULT_SLOTS, slot_size=DEFAULT_SLOT_SIZE):
+        self.name = name
+        self.slots = slots
+        self.slot_size = slot_size
+        self.sequence = 0
+        self.closed = False
+        # Receive threads may still publish while the server shuts down and closes the ring
+        self._lock = threading.Lock()
+
+        self._slot_stride = _SLOT_DATA_OFFSET + slot_size
+        size = _RING_HEADER_SIZE + slots * self._slot_stride
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a previous server process that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        _RING_HEADER.pack_into(self.shm.buf, 0, _MAGIC, _VERSION, slots, slot_size, 0, os.getpid())
+        print(f'Frame ring "{name}" created ({slots} slots x {slot_size} bytes)')
+
+    def publish(self, frame, timestamp=None):
+        """Copy a frame into the next slot and make it the latest one."""
+        if frame.nbytes > self.slot_size:
+            print(f'Frame of {frame.nbytes} bytes does not fit into ring slot, skipped')
+            return None
+
+        if not frame.flags['C_CONTIGUOUS']:
+            frame = numpy.ascontiguousarray(frame)
+
+        with self._lock:
+            if self.closed:
+                return None
+            return self._write(frame, timestamp)
+
+    def _write(self, frame, timestamp):
+        sequence = self.sequence + 1
+        offset = _RING_HEADER_SIZE + (sequence % self.slots) * self._slot_stride
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        buf = self.shm.buf
+        # Invalidate the slot while the pixels are being replaced
+        struct.pack_into('<Q', buf, offset, 0)
+        data_start = offset + _SLOT_DATA_OFFSET
+        buf[data_start:data_start + frame.nbytes] = frame.reshape(-1).view(numpy.uint8)
+        _SLOT_HEADER.pack_into(buf, offset, sequence, timestamp or time.time(),
+                               height, width, channels, frame.dtype.str.encode(), frame.nbytes)
+        struct.pack_into('<Q', buf, _LATEST_OFFSET, sequence)
+
+        self.sequence = sequence
+        return sequence
+
+    def close(self):
+        """Remove the ring; later publish() calls are ignored."""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.shm.close()
+            self.shm.unlink()
+
+
+class FrameRingReader:
+    """
+    Reads frames from a ring created by FrameRingWriter.
+
+    Frames are returned as NumPy views over the shared block, not copies. A view
+    stays valid until the writer wraps around to the same slot (``slots`` frames
+    later); call ``is_valid(header)`` after using a view, or ``copy()`` it when it
+    has to be kept.
+    """
+
+    def __init__(self, name=DEFAULT_NAME):
+        if sys.version_info >= (3, 13):
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        magic, version, slots, slot_size, _, owner = _RING_HEADER.unpack_from(self.shm.buf, 0)
+        if sys.version_info < (3, 13) and owner != os.getpid():
+            # Attaching registered the block for unlinking at exit; it belongs to the
+            # streamer. A writer in this process keeps its registration for close().
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        if magic != _MAGIC or version != _VERSION:
+            self.shm.close()
+            raise ValueError(f'Shared memory "{name}" is not a lego-cam frame ring')
+
+        self.name = name
+        self.slots = slots
+        self.slot_size = slot_size
+        self._slot_stride = _SLOT_DATA_OFFSET + slot_size
+
+    @property
+    def latest_sequence(self):
+        return struct.unpack_from('<Q', self.shm.buf, _LATEST_OFFSET)[0]
+
+    def read_latest(self):
+        """Return (header, frame view) of the newest frame, or (None, None) if empty."""
+        sequence = self.latest_sequence
+        if sequence == 0:
+            return None, None
+        return self.read(sequence)
+
+    def read(self, sequence):
+        """Return (header, frame view) for a sequence, or (None, None) if it was overwritten."""
+        offset = _RING_HEADER_SIZE + (sequence % self.slots) * self._slot_stride
+        slot_sequence, timestamp, height, width, channels, dtype, nbytes = \
+            _SLOT_HEADER.unpack_from(self.shm.buf, offset)
+        if slot_sequence != sequence:
+            return None, None
+
+        dtype = numpy.dtype(dtype.rstrip(b'\0').decode())
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        frame = numpy.ndarray(shape, dtype=dtype, buffer=self.shm.buf,
+                              offset=offset + _SLOT_DATA_OFFSET)
+        return FrameHeader(sequence, timestamp, shape, dtype, nbytes), frame
+
+    def wait_next(self, after_sequence, timeout=1.0, poll_interval=0.001):
+        """Poll until a frame newer than ``after_sequence`` is published."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.latest_sequence > after_sequence:
+                return self.read_latest()
+            time.sleep(poll_interval)
+        return None, None
+
+    def is_valid(self, header):
+        """True while the slot of ``header`` has not been reused by the writer."""
+        offset = _RING_HEADER_SIZE + (header.sequence % self.slots) * self._slot_stride
+        return struct.unpack_from('<Q', self.shm.buf, offset)[0] == header.sequence
+
+    def close(self):
+        self.shm.close()
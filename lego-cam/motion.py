@@ -0,0 +1,92 @@
+"""
+Cheap scene-change detection on incoming frames.
+
+Each frame is reduced to a small grayscale thumbnail and compared with the
+previous one. The mean absolute difference is the motion score; once it stays
+below the threshold the scene counts as settled, and callers can wait for it
+to have been settled for a given number of milliseconds. The settled time is
+the span covered by still frames since the last motion, so a stalled or slow
+stream does not count as settled before its frames show it.
+"""
+
+import threading
+import time
+
+import cv2
+
+DEFAULT_THUMB_WIDTH = 64
+DEFAULT_THRESHOLD = 2.0
+
+
+class MotionMonitor:
+
+    def __init__(self, thumb_width=DEFAULT_THUMB_WIDTH, threshold=DEFAULT_THRESHOLD):
+        self.thumb_width = thumb_width
+        self.threshold = threshold
+
+        self.cond = threading.Condition()
+        self.previous = None
+        self.score = 0.0
+        self.frame_id = 0
+        self.last_motion = time.monotonic()
+        # Capture time of the newest still frame, None until one arrives after the last motion
+        self.last_still = None
+
+    def update(self, frame):
+        """Score one frame against the previous one. Cheap enough to run per frame."""
+        height, width = frame.shape[:2]
+        thumb_height = max(1, height * self.thumb_width // width)
+        thumb = cv2.resize(frame, (self.thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+
+        now = time.monotonic()
+        with self.cond:
+            if self.previous is not None and self.previous.shape == thumb.shape:
+                self.score = float(cv2.absdiff(thumb, self.previous).mean())
+            else:
+                # First frame or resolution change: treat as motion
+                self.score = float('inf')
+            self.previous = thumb
+            self.frame_id += 1
+            if self.score >= self.threshold:
+                self.last_motion = now
+                self.last_still = None
+            else:
+                self.last_still = now
+            self.cond.notify_all()
+
+    def settled_ms(self):
+        """Milliseconds from the last frame that showed motion to the newest still frame."""
+        if self.last_still is None:
+            return 0.0
+        return (self.last_still - self.last_motion) * 1000
+
+    def status(self, settle_ms=0):
+        with self.cond:
+            settled_ms = self.settled_ms()
+            return {
+                'frame_id': self.frame_id,
+                'motion_score': self.score if self.score != float('inf') else None,
+                'threshold': self.threshold,
+                'settled_ms': int(settled_ms),
+                'settled': self.frame_id > 1 and settled_ms >= settle_ms,
+            }
+
+    def wait_settled(self, settle_ms, timeout):
+        """Block until the scene has been still for ``settle_ms`` or ``timeout`` seconds pass."""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                status = self.status(settle_ms)
+                remaining = deadline - time.monotonic()
+                if status['settled'] or remaining <= 0:
+                    return status
+                # Only a new frame can extend the still span
+                self.cond.wait(remaining)
+
+    def wait_frame(self, after_frame_id, timeout, settle_ms=0):
+        """Block until a frame newer than ``after_frame_id`` has been scored."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.frame_id > after_frame_id, timeout)
+            return self.status(settle_ms)
@@ -0,0 +1,134 @@
+"""
+Wire format between the capture client and the Streamer.
+
+A connection starts with a hello: ``LCAM``, a 2-byte JSON length and 2 padding
+bytes, then the JSON (e.g. ``{"camera_id": "overhead"}``). Every frame after
+that is sent as an 8-byte big-endian payload size followed by the frame
+serialized with ``numpy.save`` (.npy format). A connection that starts directly
+with a frame is treated as camera ``default``.
+
+In the other direction the server may send control messages with the same
+layout as the hello but the ``LCTL`` magic, e.g. ``{"fps": 1, "scale": 0.5}``
+to ask the client for a lower rate and resolution while nobody is watching.
+"""
+
+import ast
+import json
+import struct
+from io import BytesIO
+
+import numpy
+
+FRAME_HEADER = struct.Struct('!Q')
+# Same size as FRAME_HEADER so the first 8 bytes tell a hello from a frame
+HELLO_HEADER = struct.Struct('!4sHxx')
+HELLO_MAGIC = b'LCAM'
+CONTROL_MAGIC = b'LCTL'
+DEFAULT_CAMERA_ID = 'default'
+
+_NPY_MAGIC = b'\x93NUMPY'
+
+
+def encode_frame(frame):
+    """Serialize a frame into header + .npy payload."""
+    memfile = BytesIO()
+    memfile.write(b'\0' * FRAME_HEADER.size)
+    numpy.save(memfile, frame, allow_pickle=False)
+    data = memfile.getbuffer()
+    FRAME_HEADER.pack_into(data, 0, len(data) - FRAME_HEADER.size)
+    return data
+
+
+def encode_hello(camera_id, **info):
+    """Handshake identifying the camera, sent once right after connecting."""
+    payload = json.dumps(dict(info, camera_id=camera_id)).encode()
+    return HELLO_HEADER.pack(HELLO_MAGIC, len(payload)) + payload
+
+
+def recv_hello(conn, header):
+    """
+    Read the first 8 bytes of a connection into ``header``.
+
+    Returns (hello dict, False) for a hello, or ({'camera_id': 'default'}, True)
+    when the client started sending frames right away and ``header`` already
+    holds the first frame size. Returns (None, False) if the connection closed.
+    """
+    if not recv_exact_into(conn, memoryview(header)):
+        return None, False
+
+    magic, length = HELLO_HEADER.unpack(header)
+    if magic != HELLO_MAGIC:
+        return {'camera_id': DEFAULT_CAMERA_ID}, True
+
+    payload = bytearray(length)
+    if not recv_exact_into(conn, memoryview(payload)):
+        return None, False
+    return json.loads(payload), False
+
+
+def encode_control(**settings):
+    """Control message from the server to a client."""
+    payload = json.dumps(settings).encode()
+    return HELLO_HEADER.pack(CONTROL_MAGIC, len(payload)) + payload
+
+
+def recv_control(conn):
+    """Read the next control message from the server. Returns None when the connection closed."""
+    header = bytearray(HELLO_HEADER.size)
+    if not recv_exact_into(conn, memoryview(header)):
+        return None
+
+    magic, length = HELLO_HEADER.unpack(header)
+    if magic != CONTROL_MAGIC:
+        raise ValueError('Unexpected message from server')
+
+    payload = bytearray(length)
+    if not recv_exact_into(conn, memoryview(payload)):
+        return None
+    return json.loads(payload)
+
+
+def recv_exact_into(conn, view):
+    """Fill ``view`` from the socket. Returns False if the connection closed first."""
+    received = 0
+    size = len(view)
+    while received < size:
+        count = conn.recv_into(view[received:], size - received)
+        if count == 0:
+            return False
+        received += count
+    return True
+
+
+def decode_frame(view):
+    """
+    Build an ndarray directly over a received .npy payload, without copying it.
+
+    The returned array shares memory with ``view`` and is only valid until the
+    buffer is reused for the next frame.
+    """
+    if bytes(view[:6]) != _NPY_MAGIC:
+        raise ValueError('Payload is not a .npy frame')
+
+    major = view[6]
+    if major == 1:
+        header_len = struct.unpack_from('<H', view, 8)[0]
+        header_start = 10
+    else:
+        header_len = struct.unpack_from('<I', view, 8)[0]
+        header_start = 12
+
+    header = ast.literal_eval(bytes(view[header_start:header_start + header_len]).decode('latin1'))
+    dtype = numpy.dtype(header['descr'])
+    if dtype.hasobject:
+        raise ValueError('Object arrays are not accepted as frames')
+
+    shape = header['shape']
+    count = 1
+    for dim in shape:
+        count *= dim
+
+    frame = numpy.frombuffer(view, dtype=dtype, count=count, offset=header_start + header_len)
+    if header['fortran_order']:
+        return frame.reshape(shape[::-1]).transpose()
+    return frame.reshape(shape)
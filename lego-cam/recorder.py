@@ -0,0 +1,139 @@
+"""
+Recording of received frames into segmented, append-only files.
+
+A session directory holds::
+
+    session.json          | format ('jpeg' or 'raw') and segment list
+    segment_00000.frames  | frame blocks back to back
+    segment_00000.index   | one fixed-size record per frame: offset, length, timestamp, frame id
+
+Raw blocks are the .npy payloads exactly as received from the client, so a
+memory-mapped segment can be turned back into frames without copying.
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+
+import cv2
+import numpy
+
+from protocol import decode_frame
+
+FORMATS = ('jpeg', 'raw')
+DEFAULT_SEGMENT_BYTES = 256 * 1024 * 1024
+
+# offset, length, timestamp, frame id
+INDEX_RECORD = struct.Struct('<QQdQ')
+
+
+class FrameRecorder:
+
+    def __init__(self, directory, frame_format='jpeg', segment_bytes=DEFAULT_SEGMENT_BYTES):
+        if frame_format not in FORMATS:
+            raise ValueError(f'Unknown recording format: {frame_format}')
+
+        self.directory = os.path.join(directory, time.strftime('%Y%m%d_%H%M%S'))
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.frame_format = frame_format
+        self.segment_bytes = segment_bytes
+        self.segments = []
+        self.frames = 0
+        self._data = None
+        self._index = None
+        self._offset = 0
+
+        self._open_segment()
+        print(f'Recording {frame_format} frames to {self.directory}')
+
+    def _open_segment(self):
+        if self._data is not None:
+            self._data.close()
+            self._index.close()
+
+        name = f'segment_{len(self.segments):05d}'
+        self._data = open(os.path.join(self.directory, name + '.frames'), 'ab')
+        self._index = open(os.path.join(self.directory, name + '.index'), 'ab')
+        self._offset = 0
+        self.segments.append(name)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        with open(os.path.join(self.directory, 'session.json'), 'w') as f:
+            json.dump({'format': self.frame_format, 'segments': self.segments}, f, indent=2)
+
+    def record(self, frame_id, payload=None, jpeg=None, frame=None, timestamp=None):
+        """
+        Append one frame.
+
+        ``payload`` is the raw .npy payload from the client (used for 'raw'), ``jpeg``
+        the already encoded image (used for 'jpeg'); ``frame`` is encoded when the
+        block for the configured format was not provided.
+        """
+        if self.frame_format == 'raw':
+            block = payload
+        else:
+            block = jpeg
+            if block is None and frame is not None:
+                block = cv2.imencode('.jpg', frame)[1]
+        if block is None:
+            return
+
+        block = memoryview(block).cast('B')
+        if self._offset and self._offset + len(block) > self.segment_bytes:
+            self._open_segment()
+
+        self._data.write(block)
+        self._index.write(INDEX_RECORD.pack(self._offset, len(block), timestamp or time.time(), frame_id))
+        self._offset += len(block)
+        self.frames += 1
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+
+class Recording:
+    """Memory-mapped read access to a recorded session."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'session.json')) as f:
+            manifest = json.load(f)
+
+        self.directory = directory
+        self.frame_format = manifest['format']
+        self.segments = manifest['segments']
+
+    def __iter__(self):
+        """Yield (timestamp, frame_id, block) where block is a memoryview into the mapped segment."""
+        for name in self.segments:
+            data_path = os.path.join(self.directory, name + '.frames')
+            if os.path.getsize(data_path) == 0:
+                continue
+
+            with open(os.path.join(self.directory, name + '.index'), 'rb') as f:
+                index = f.read()
+
+            # The mapping is released once no yielded block or frame refers to it any more
+            with open(data_path, 'rb') as f:
+                view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+            # Ignore a partially written last record of a segment that is still being recorded
+            complete = len(index) - len(index) % INDEX_RECORD.size
+            for offset, length, timestamp, frame_id in INDEX_RECORD.iter_unpack(index[:complete]):
+                if offset + length > len(view):
+                    break
+                yield timestamp, frame_id, view[offset:offset + length]
+
+    def frames(self):
+        """Yield (timestamp, frame_id, frame) with frames decoded from the blocks."""
+        for timestamp, frame_id, block in self:
+            if self.frame_format == 'raw':
+                # Zero-copy view into the mapped segment
+                frame = decode_frame(block)
+            else:
+                frame = cv2.imdecode(numpy.frombuffer(block, dtype=numpy.uint8), cv2.IMREAD_COLOR)
+            yield timestamp, frame_id, frame
@@ -0,0 +1,113 @@
+"""
+Lens undistortion and top-down rectification of the playing field.
+
+The lens model and the field homography are folded into one pair of remap
+tables when the calibration is loaded, so rectifying a frame costs a single
+``cv2.remap``. In the rectified image every pixel has the same size on the
+field (``pixels_per_cm``), so distances no longer depend on where objects are.
+
+Calibration file (JSON, keyed by camera id)::
+
+    {
+      "default": {
+        "camera_matrix": [[fx, 0, cx], [0, fy, cy], [0, 0, 1]],   // optional
+        "dist_coeffs": [k1, k2, p1, p2, k3],                       // optional
+        "image_size": [1024, 768],
+        "field_corners": [[x, y], ...],   // top-left, top-right, bottom-right, bottom-left
+        "field_size_cm": [120, 80],
+        "pixels_per_cm": 8
+      }
+    }
+
+``field_corners`` are pixel positions in the undistorted image.
+"""
+
+import argparse
+import json
+
+import cv2
+import numpy
+
+
+class FieldRectifier:
+
+    def __init__(self, image_size, field_corners, field_size_cm, pixels_per_cm=8.0,
+                 camera_matrix=None, dist_coeffs=None):
+        self.image_size = tuple(image_size)
+        self.field_size_cm = tuple(field_size_cm)
+        self.pixels_per_cm = float(pixels_per_cm)
+        self.output_size = (int(round(field_size_cm[0] * pixels_per_cm)),
+                            int(round(field_size_cm[1] * pixels_per_cm)))
+
+        out_w, out_h = self.output_size
+        destination = numpy.float32([[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]])
+        self.homography = cv2.getPerspectiveTransform(numpy.float32(field_corners), destination)
+
+        # Undistorted source position of every rectified output pixel
+        grid_x, grid_y = numpy.meshgrid(numpy.arange(out_w, dtype=numpy.float32),
+                                        numpy.arange(out_h, dtype=numpy.float32))
+        grid = numpy.dstack([grid_x, grid_y]).reshape(-1, 1, 2)
+        source = cv2.perspectiveTransform(grid, numpy.linalg.inv(self.homography)).reshape(out_h, out_w, 2)
+        map_x, map_y = source[..., 0], source[..., 1]
+
+        if camera_matrix is not None:
+            # Chain the lens model: look up the distorted camera pixel of each undistorted position
+            camera_matrix = numpy.float64(camera_matrix)
+            dist_coeffs = numpy.float64(dist_coeffs if dist_coeffs is not None else [0, 0, 0, 0, 0])
+            undistort_x, undistort_y = cv2.initUndistortRectifyMap(
+                camera_matrix, dist_coeffs, None, camera_matrix, self.image_size, cv2.CV_32FC1)
+            map_x, map_y = (cv2.remap(undistort_x, map_x, map_y, cv2.INTER_LINEAR),
+                            cv2.remap(undistort_y, map_x, map_y, cv2.INTER_LINEAR))
+
+        # Fixed-point maps are considerably faster to apply than float maps
+        self.map1, self.map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    @classmethod
+    def from_dict(cls, calibration):
+        return cls(
+            image_size=calibration['image_size'],
+            field_corners=calibration['field_corners'],
+            field_size_cm=calibration['field_size_cm'],
+            pixels_per_cm=calibration.get('pixels_per_cm', 8.0),
+            camera_matrix=calibration.get('camera_matrix'),
+            dist_coeffs=calibration.get('dist_coeffs'),
+        )
+
+    def rectify(self, frame, dst=None):
+        """Top-down view of the field for one frame (a single remap)."""
+        height, width = frame.shape[:2]
+        if (width, height) != self.image_size:
+            frame = cv2.resize(frame, self.image_size, interpolation=cv2.INTER_AREA)
+        return cv2.remap(frame, self.map1, self.map2, cv2.INTER_LINEAR, dst=dst)
+
+    def info(self):
+        return {
+            'output_size': self.output_size,
+            'field_size_cm': self.field_size_cm,
+            'pixels_per_cm': self.pixels_per_cm,
+            'origin': 'top-left corner of the field',
+        }
+
+
+def load_rectifiers(path):
+    """Load a calibration file into {camera_id: FieldRectifier}."""
+    with open(path) as f:
+        calibrations = json.load(f)
+    return {camera_id: FieldRectifier.from_dict(calibration) for camera_id, calibration in calibrations.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Preview the rectified field for a calibration')
+    parser.add_argument('calibration', help='calibration JSON file')
+    parser.add_argument('image', help='camera image to rectify')
+    parser.add_argument('output', help='where to write the rectified image')
+    parser.add_argument('--camera-id', default='default')
+    args = parser.parse_args()
+
+    rectifier = load_rectifiers(args.calibration)[args.camera_id]
+    cv2.imwrite(args.output, rectifier.rectify(cv2.imread(args.image)))
+    print(f'Rectified {args.image} -> {args.output} {rectifier.info()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Replay a recorded session into a Streamer, standing in for client.py.
+
+Frames are sent with the same wire protocol as the live client, at the recorded
+pace divided by ``--speed`` (or as fast as possible with ``--speed 0``), which
+gives a repeatable workload for benchmarking the server and everything behind it.
+"""
+
+import argparse
+import socket
+import time
+
+from protocol import DEFAULT_CAMERA_ID, FRAME_HEADER, encode_frame, encode_hello
+from recorder import Recording
+
+
+def replay(recording, client_socket, speed=1.0):
+    """Send every frame of a recording. Returns (frames sent, seconds taken)."""
+    sent = 0
+    started = time.monotonic()
+    first_timestamp = None
+
+    for timestamp, frame_id, block in recording:
+        if first_timestamp is None:
+            first_timestamp = timestamp
+
+        if speed > 0:
+            due = started + (timestamp - first_timestamp) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        if recording.frame_format == 'raw':
+            # The recorded block already is the .npy payload, send it straight from the mapping
+            client_socket.sendall(FRAME_HEADER.pack(len(block)))
+            client_socket.sendall(block)
+        else:
+            client_socket.sendall(encode_frame(_decode_jpeg(block)))
+        sent += 1
+
+    return sent, time.monotonic() - started
+
+
+def _decode_jpeg(block):
+    import cv2
+    import numpy
+    return cv2.imdecode(numpy.frombuffer(block, dtype=numpy.uint8), cv2.IMREAD_COLOR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded lego-cam session into the server')
+    parser.add_argument('session', help='session directory written by FrameRecorder')
+    parser.add_argument('--host', default='192.168.0.50')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--camera-id', default=DEFAULT_CAMERA_ID)
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='playback speed factor, 0 sends as fast as possible')
+    parser.add_argument('--loop', type=int, default=1, help='number of times to play the session')
+    args = parser.parse_args()
+
+    recording = Recording(args.session)
+
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    client_socket.connect((args.host, args.port))
+    client_socket.sendall(encode_hello(args.camera_id))
+
+    for _ in range(args.loop):
+        sent, elapsed = replay(recording, client_socket, args.speed)
+        print(f'Replayed {sent} frames in {elapsed:.2f}s ({sent / elapsed if elapsed else 0:.1f} fps)')
+
+    client_socket.close()
+
+
+if __name__ == '__main__':
+    main()
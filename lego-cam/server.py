@@ -1,18 +1,104 @@
-from flask import Flask, render_template, Response
+import contextlib
+import json
+import os
+import signal
+import sys
+import time
+from flask import Flask, render_template, Response, jsonify, request
 from flask_cors import CORS
+from motion import MotionMonitor
 from streamer import Streamer
 
 app = Flask(__name__)
 CORS(app)
 
-streamer = Streamer('192.168.0.50', 8080)
+# Publish raw frames to shared memory for detectors running on this host
+frame_ring = None
+if os.environ.get('LEGO_CAM_SHM', '0') == '1':
+  from frame_ring import FrameRingWriter
+  frame_ring = FrameRingWriter(os.environ.get('LEGO_CAM_SHM_NAME', 'lego-cam-frames'))
+
+motion = MotionMonitor(threshold=float(os.environ.get('LEGO_CAM_MOTION_THRESHOLD', '2.0')))
+
+# Continuously refreshed object detections (needs the lego-robot-agent package)
+edge_detector = None
+if os.environ.get('LEGO_CAM_DETECTION', '0') == '1':
+  from edge_detection import EdgeDetector
+  edge_detector = EdgeDetector(fps=float(os.environ.get('LEGO_CAM_DETECTION_FPS', '2.0')))
+  edge_detector.start()
+
+# Record received frames for offline replay (see replay.py)
+recorder = None
+if os.environ.get('LEGO_CAM_RECORD_DIR'):
+  from recorder import FrameRecorder
+  recorder = FrameRecorder(os.environ['LEGO_CAM_RECORD_DIR'], os.environ.get('LEGO_CAM_RECORD_FORMAT', 'jpeg'))
+
+# Lens undistortion and top-down field rectification per camera (see rectify.py)
+rectifiers = {}
+if os.environ.get('LEGO_CAM_CALIBRATION'):
+  from rectify import load_rectifiers
+  rectifiers = load_rectifiers(os.environ['LEGO_CAM_CALIBRATION'])
+
+streamer = Streamer('192.168.0.50', 8080, frame_ring=frame_ring, motion=motion,
+                    edge_detector=edge_detector, recorder=recorder,
+                    primary_camera=os.environ.get('LEGO_CAM_PRIMARY'), rectifiers=rectifiers)
 streamer.start()
 
-def gen():
+# Ask cameras for full rate and resolution only while somebody is consuming them
+demand = None
+if os.environ.get('LEGO_CAM_ADAPTIVE', '0') == '1':
+  from demand import DemandController
+  primary_idle = None
+  if edge_detector is not None:
+    # Edge detection works on full-resolution frames at its own rate
+    primary_idle = {'fps': max(float(os.environ.get('LEGO_CAM_IDLE_FPS', '1')), 1.0 / edge_detector.interval), 'scale': 1.0}
+  demand = DemandController(streamer,
+                            idle_fps=float(os.environ.get('LEGO_CAM_IDLE_FPS', '1')),
+                            idle_scale=float(os.environ.get('LEGO_CAM_IDLE_SCALE', '0.5')),
+                            primary_idle=primary_idle)
+  demand.start()
+
+def consumer(camera_id=None):
+  """Context manager marking an active consumer of a camera for the demand controller."""
+  if demand is None:
+    return contextlib.nullcontext()
+  return demand.acquire(camera_id)
+
+def gen(camera_id=None):
 
-  while True:
-    if streamer.streaming:
-      yield (b'--frame\r\n'b'Content-Type: image/jpeg\r\n\r\n' + streamer.get_jpeg() + b'\r\n\r\n')
+  with consumer(camera_id):
+    frame_id = 0
+    while True:
+      source = streamer.get_source(camera_id)
+      if source is None:
+        time.sleep(0.5)
+        continue
+      # Wait for a new frame instead of re-sending the same one
+      frame_id = source.wait_frame(frame_id, timeout=1.0)
+      if source.streaming:
+        yield (b'--frame\r\n'b'Content-Type: image/jpeg\r\n\r\n' + source.get_jpeg() + b'\r\n\r\n')
+
+def photo_response(camera_id=None):
+    source = streamer.get_source(camera_id)
+    if demand is not None and source is not None:
+        # Burst to full rate and wait for the first full-resolution frame if the camera was idling
+        demand.touch(camera_id)
+        source.wait_full_frame(timeout=request.args.get('timeout', 3.0, type=float))
+    if source is None or not source.streaming or source.get_jpeg() is None:
+        return jsonify({'error': f'Camera {camera_id or streamer.primary_camera} is not streaming'}), 503
+    return Response(source.get_jpeg(), mimetype='image/jpeg')
+
+def rectified_response(camera_id=None):
+    source = streamer.get_source(camera_id)
+    if source is None or source.rectifier is None:
+        return jsonify({'error': f'No field calibration for camera {camera_id or streamer.primary_camera}'}), 404
+    if demand is not None:
+        demand.touch(camera_id)
+        source.wait_full_frame(timeout=request.args.get('timeout', 3.0, type=float))
+    jpeg = source.get_rectified_jpeg()
+    if not source.streaming or jpeg is None:
+        return jsonify({'error': f'Camera {source.camera_id} is not streaming'}), 503
+    return Response(jpeg, mimetype='image/jpeg')
 
 @app.route('/')
 def index():
@@ -24,8 +110,106 @@ def video_feed():
 
 @app.route('/photo')
 def photo():
-    if streamer.streaming and streamer.get_jpeg():
-        return Response(streamer.get_jpeg(), mimetype='image/jpeg')
-    
+    return photo_response()
+
+@app.route('/photo/rectified')
+def photo_rectified():
+    return rectified_response()
+
+@app.route('/cams')
+def cams():
+    return jsonify({'primary': streamer.primary_camera, 'cameras': streamer.stats()})
+
+@app.route('/cam/<camera_id>/video_feed')
+def cam_video_feed(camera_id):
+  if streamer.get_source(camera_id) is None:
+    return jsonify({'error': f'Unknown camera {camera_id}'}), 404
+  return Response(gen(camera_id), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/cam/<camera_id>/photo')
+def cam_photo(camera_id):
+    if streamer.get_source(camera_id) is None:
+        return jsonify({'error': f'Unknown camera {camera_id}'}), 404
+    return photo_response(camera_id)
+
+@app.route('/cam/<camera_id>/photo/rectified')
+def cam_photo_rectified(camera_id):
+    return rectified_response(camera_id)
+
+@app.route('/cam/<camera_id>/calibration')
+def cam_calibration(camera_id):
+    rectifier = rectifiers.get(camera_id)
+    if rectifier is None:
+        return jsonify({'error': f'No field calibration for camera {camera_id}'}), 404
+    return jsonify(rectifier.info())
+
+@app.route('/motion')
+def motion_status():
+    return jsonify(motion.status(request.args.get('settle_ms', 0, type=int)))
+
+@app.route('/settled')
+def settled():
+    # Long-poll: returns as soon as the scene has been still for settle_ms, or on timeout
+    settle_ms = request.args.get('settle_ms', 500, type=int)
+    timeout = min(request.args.get('timeout', 10.0, type=float), 60.0)
+    with consumer():
+        status = motion.wait_settled(settle_ms, timeout)
+    status['streaming'] = streamer.streaming
+    return jsonify(status)
+
+@app.route('/motion_feed')
+def motion_feed():
+    settle_ms = request.args.get('settle_ms', 500, type=int)
+
+    def events():
+      with consumer():
+        frame_id = 0
+        while True:
+          status = motion.wait_frame(frame_id, timeout=1.0, settle_ms=settle_ms)
+          frame_id = status['frame_id']
+          yield f'data: {json.dumps(status)}\n\n'
+
+    return Response(events(), mimetype='text/event-stream')
+
+@app.route('/detections')
+def detections():
+    if edge_detector is None:
+        return jsonify({'error': 'Edge detection is not enabled (LEGO_CAM_DETECTION=1)'}), 404
+
+    # With ?after=<frame_id> wait for a result newer than the one the caller already has
+    after = request.args.get('after', type=int)
+    if after is None:
+        result = edge_detector.latest()
+    else:
+        with consumer():
+            result = edge_detector.wait_result(after, min(request.args.get('timeout', 5.0, type=float), 60.0))
+
+    if result is None:
+        return jsonify({'error': 'No detection result yet'}), 503
+    return jsonify(result)
+
+@app.route('/detections_feed')
+def detections_feed():
+    if edge_detector is None:
+        return jsonify({'error': 'Edge detection is not enabled (LEGO_CAM_DETECTION=1)'}), 404
+
+    def events():
+      with consumer():
+        frame_id = 0
+        while True:
+          result = edge_detector.wait_result(frame_id, timeout=5.0)
+          if result is not None and result['frame_id'] > frame_id:
+            frame_id = result['frame_id']
+            yield f'data: {json.dumps(result)}\n\n'
+
+    return Response(events(), mimetype='text/event-stream')
+
 if __name__ == '__main__':
-  app.run(host='192.168.0.50', threaded=True)
+  # Let SIGTERM unwind like Ctrl+C so the shutdown below runs
+  signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+  try:
+    app.run(host='192.168.0.50', threaded=True)
+  finally:
+    if frame_ring is not None:
+      # Otherwise the shared block outlives the server until the next start replaces it
+      frame_ring.close()
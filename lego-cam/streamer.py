@@ -1,32 +1,240 @@
 import cv2
-import numpy
 import socket
-import struct
 import threading
-from io import BytesIO
+import time
+
+from protocol import FRAME_HEADER, decode_frame, encode_control, recv_exact_into, recv_hello
+
+
+class CameraSource:
+    """Latest frame and statistics of one camera, kept across reconnects."""
+
+    def __init__(self, camera_id, frame_ring=None, motion=None, edge_detector=None, recorder=None, rectifier=None):
+        self.camera_id = camera_id
+        # Optional FieldRectifier producing the top-down view of the field
+        self.rectifier = rectifier
+        # Optional FrameRingWriter that receives every raw frame for local consumers
+        self.frame_ring = frame_ring
+        # Optional MotionMonitor scoring scene changes on every frame
+        self.motion = motion
+        # Optional EdgeDetector running object detection on sampled frames
+        self.edge_detector = edge_detector
+        # Optional FrameRecorder appending every frame to a session on disk
+        self.recorder = recorder
+
+        self.cond = threading.Condition()
+        self.conn = None
+        self.address = None
+        # Hello of the current connection (full width/height/fps) and the mode last requested from it
+        self.info = {}
+        self.mode = None
+        # Widest frame received while the client was asked for full resolution
+        self.full_width = None
+        self.frame_shape = None
+        self.streaming = False
+        self.jpeg = None
+        self.frame_id = 0
+        self.rectified = None
+        self._rectified_jpeg = (0, None)
+
+        self.connections = 0
+        self.bytes_received = 0
+        self.connected_at = None
+        self.last_frame_at = None
+        self.fps = 0.0
+
+    def attach(self, conn, address, info=None):
+        """Make ``conn`` the active connection, dropping a stale one from before a reconnect."""
+        with self.cond:
+            previous = self.conn
+            self.conn = conn
+            self.address = address
+            self.info = info or {}
+            self.mode = None
+            self.full_width = None
+            self.connections += 1
+            self.connected_at = time.time()
+        if previous is not None:
+            print(f'Camera {self.camera_id} reconnected, closing previous connection')
+            try:
+                # Wakes up the receive loop still blocked on the stale connection
+                previous.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def receive(self, conn, header, have_header=False):
+        """Receive frames from ``conn`` until it closes. With ``have_header`` the first frame size is in ``header``."""
+        header_view = memoryview(header)
+        # Reused for every frame and only grown when a larger frame arrives
+        buffer = bytearray()
+
+        while True:
+
+            if have_header or recv_exact_into(conn, header_view):
+                have_header = False
+                # Read frame size
+                msg_size = FRAME_HEADER.unpack(header)[0]
+
+                if len(buffer) < msg_size:
+                    buffer = bytearray(msg_size)
+                payload = memoryview(buffer)[:msg_size]
+
+                # Read the payload (the actual frame)
+                if not recv_exact_into(conn, payload):
+                    # Connection interrupted, skip building the partial frame
+                    continue
+
+                # The frame is a view over the receive buffer, valid until the next recv
+                frame = decode_frame(payload)
+                self._publish(frame, payload)
+            else:
+                break
+
+    def _publish(self, frame, payload):
+        frame_id = self.frame_id + 1
+
+        if self.frame_ring is not None:
+            self.frame_ring.publish(frame)
+
+        if self.motion is not None:
+            self.motion.update(frame)
+
+        if self.edge_detector is not None:
+            self.edge_detector.submit(frame, frame_id)
+
+        ret, jpeg = cv2.imencode('.jpg', frame)
+
+        # One remap with the precomputed tables; encoded only when someone asks for it
+        rectified = self.rectifier.rectify(frame) if self.rectifier is not None else None
+
+        if self.recorder is not None:
+            self.recorder.record(frame_id, payload=payload, jpeg=jpeg)
+
+        now = time.time()
+        with self.cond:
+            if self.last_frame_at is not None and now > self.last_frame_at:
+                self.fps = 0.9 * self.fps + 0.1 / (now - self.last_frame_at)
+            self.last_frame_at = now
+            self.bytes_received += len(payload) + FRAME_HEADER.size
+            self.jpeg = jpeg
+            self.frame_shape = frame.shape
+            if self.mode is None or self.mode.get('scale', 1.0) >= 1.0:
+                self.full_width = max(self.full_width or 0, frame.shape[1])
+            self.rectified = rectified
+            self.frame_id = frame_id
+            self.streaming = True
+            self.cond.notify_all()
+
+    def detach(self, conn):
+        with self.cond:
+            # A newer connection may already have taken over
+            if self.conn is not conn:
+                return
+            self.conn = None
+            self.streaming = False
+            self.fps = 0.0
+            self.cond.notify_all()
+
+    def send_control(self, mode):
+        """Ask the connected client for a capture rate/resolution (see DemandController)."""
+        with self.cond:
+            conn = self.conn
+            self.mode = mode
+        if conn is None:
+            return
+        try:
+            conn.sendall(encode_control(**mode))
+        except OSError as e:
+            print(f'Control message to camera {self.camera_id} failed: {e}')
+
+    def wait_full_frame(self, timeout):
+        """
+        Block until the latest frame has full resolution: the width received in
+        full mode, or before any such frame, the width announced in the hello.
+        """
+        with self.cond:
+            full_width = self.full_width or self.info.get('width')
+            if full_width is None:
+                return True
+            return self.cond.wait_for(
+                lambda: self.frame_shape is not None and self.frame_shape[1] >= full_width, timeout)
+
+    def get_jpeg(self):
+        jpeg = self.jpeg
+        return jpeg.tobytes() if jpeg is not None else None
+
+    def get_rectified_jpeg(self):
+        with self.cond:
+            rectified, frame_id = self.rectified, self.frame_id
+            cached_id, cached = self._rectified_jpeg
+        if rectified is None:
+            return None
+        if cached_id != frame_id:
+            cached = cv2.imencode('.jpg', rectified)[1].tobytes()
+            with self.cond:
+                self._rectified_jpeg = (frame_id, cached)
+        return cached
+
+    def wait_frame(self, after_frame_id, timeout):
+        """Block until a frame newer than ``after_frame_id`` arrives. Returns the latest frame id."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.frame_id > after_frame_id, timeout)
+            return self.frame_id
+
+    def stats(self):
+        with self.cond:
+            return {
+                'camera_id': self.camera_id,
+                'streaming': self.streaming,
+                'address': self.address[0] if self.address else None,
+                'frame_id': self.frame_id,
+                'fps': round(self.fps, 1),
+                'mode': self.mode,
+                'frame_shape': self.frame_shape,
+                'bytes_received': self.bytes_received,
+                'reconnects': max(0, self.connections - 1),
+                'connected_at': self.connected_at,
+                'last_frame_age': round(time.time() - self.last_frame_at, 3) if self.last_frame_at else None,
+            }
 
 
 class Streamer(threading.Thread):
+    """
+    Ingest server for any number of camera clients.
 
-    def __init__(self, hostname, port):
+    Each connection identifies its camera in the handshake and feeds that
+    camera's CameraSource; a camera that reconnects resumes the same source.
+    The frame ring, motion monitor, edge detector and recorder are attached to
+    the primary camera only (``primary_camera``, or the first camera seen).
+    """
+
+    def __init__(self, hostname, port, frame_ring=None, motion=None, edge_detector=None, recorder=None,
+                 primary_camera=None, rectifiers=None):
         threading.Thread.__init__(self)
 
         self.hostname = hostname
         self.port = port
+        self.frame_ring = frame_ring
+        self.motion = motion
+        self.edge_detector = edge_detector
+        self.recorder = recorder
+        self.primary_camera = primary_camera
+        # {camera_id: FieldRectifier} from the calibration file
+        self.rectifiers = rectifiers or {}
         self.running = False
-        self.streaming = False
-        self.jpeg = None
+
+        self.lock = threading.Lock()
+        self.sources = {}
 
     def run(self):
 
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         print('Socket created')
 
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         s.bind((self.hostname, self.port))
         print('Socket bind complete')
 
-        payload_size = struct.calcsize("L")
-
         s.listen(10)
         print('Socket now listening')
 
@@ -37,53 +245,73 @@ class Streamer(threading.Thread):
             print('Start listening for connections...')
 
             conn, addr = s.accept()
-            print("New connection accepted.")
+            print(f"New connection accepted from {addr[0]}.")
 
-            while True:
+            threading.Thread(target=self._serve, args=(conn, addr), daemon=True).start()
 
-                data = conn.recv(payload_size)
-
-                if data:
-                    # Read frame size
-                    msg_size = struct.unpack("L", data)[0]
+        s.close()
+        print('Exit thread.')
 
-                    # Read the payload (the actual frame)
-                    data = b''
-                    while len(data) < msg_size:
-                        missing_data = conn.recv(msg_size - len(data))
-                        if missing_data:
-                            data += missing_data
-                        else:
-                            # Connection interrupted
-                            self.streaming = False
-                            break
+    def _serve(self, conn, addr):
+        header = bytearray(FRAME_HEADER.size)
+        source = None
+        try:
+            hello, has_frame_header = recv_hello(conn, header)
+            if hello is None:
+                return
 
-                    # Skip building frame since streaming ended
-                    if self.jpeg is not None and not self.streaming:
-                        continue
+            source = self.get_or_create_source(str(hello['camera_id']))
+            source.attach(conn, addr, hello)
+            print(f'Camera {source.camera_id} streaming from {addr[0]}')
 
-                    # Convert the byte array to a 'jpeg' format
-                    memfile = BytesIO()
-                    memfile.write(data)
-                    memfile.seek(0)
-                    frame = numpy.load(memfile, allow_pickle=True)
+            source.receive(conn, header, has_frame_header)
+        except (OSError, ValueError) as e:
+            print(f'Connection from {addr[0]} failed: {e}')
+        finally:
+            conn.close()
 
-                    ret, jpeg = cv2.imencode('.jpg', frame)
-                    self.jpeg = jpeg
+        if source is not None:
+            source.detach(conn)
+            print(f'Closing connection of camera {source.camera_id}...')
 
-                    self.streaming = True
+    def get_or_create_source(self, camera_id):
+        with self.lock:
+            source = self.sources.get(camera_id)
+            if source is None:
+                if self.primary_camera is None:
+                    self.primary_camera = camera_id
+                rectifier = self.rectifiers.get(camera_id)
+                if camera_id == self.primary_camera:
+                    source = CameraSource(camera_id, self.frame_ring, self.motion, self.edge_detector, self.recorder,
+                                          rectifier=rectifier)
                 else:
-                    conn.close()
-                    print('Closing connection...')
-                    self.streaming = False
-                    self.running = False
-                    self.jpeg = None
-                    break
+                    source = CameraSource(camera_id, rectifier=rectifier)
+                self.sources[camera_id] = source
+            return source
 
-        print('Exit thread.')
+    def get_source(self, camera_id=None):
+        """Source of ``camera_id``, or of the primary camera. None if it never connected."""
+        with self.lock:
+            return self.sources.get(camera_id if camera_id is not None else self.primary_camera)
+
+    def stats(self):
+        with self.lock:
+            sources = list(self.sources.values())
+        return [source.stats() for source in sources]
+
+    @property
+    def streaming(self):
+        source = self.get_source()
+        return source is not None and source.streaming
+
+    @property
+    def frame_id(self):
+        source = self.get_source()
+        return source.frame_id if source is not None else 0
 
     def stop(self):
         self.running = False
 
-    def get_jpeg(self):
-        return self.jpeg.tobytes()
+    def get_jpeg(self, camera_id=None):
+        source = self.get_source(camera_id)
+        return source.get_jpeg() if source is not None else None
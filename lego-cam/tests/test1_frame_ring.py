@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared-memory frame ring.
+This test verifies that published frames read back unchanged, and that readers
+notice slots that are being rewritten or were reused by the writer, and that
+only the writer removes the shared block.
+"""
+
+import os
+import struct
+import subprocess
+import sys
+
+import numpy
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from multiprocessing import shared_memory
+
+from frame_ring import FrameRingReader, FrameRingWriter, _RING_HEADER_SIZE
+
+RING_NAME = f'lego-cam-test-{os.getpid()}'
+
+
+def make_frame(value, shape=(48, 64, 3)):
+    frame = numpy.full(shape, value, dtype=numpy.uint8)
+    frame[0, 0] = value + 1
+    return frame
+
+
+def test_round_trip():
+    """Test that color and grayscale frames read back with shape, dtype and pixels intact"""
+    writer = FrameRingWriter(RING_NAME, slots=3, slot_size=64 * 48 * 3)
+    reader = FrameRingReader(RING_NAME)
+    try:
+        header, frame = reader.read_latest()
+        assert header is None and frame is None, "An empty ring has no latest frame"
+
+        color = make_frame(10)
+        sequence = writer.publish(color, timestamp=123.5)
+        header, frame = reader.read_latest()
+        assert header.sequence == sequence == 1, "Latest sequence should be the published one"
+        assert header.timestamp == 123.5, "Timestamp should be kept"
+        assert frame.shape == color.shape and frame.dtype == color.dtype, "Shape and dtype should be kept"
+        assert numpy.array_equal(frame, color), "Pixels should read back unchanged"
+
+        gray = make_frame(20, shape=(48, 64))
+        writer.publish(gray)
+        header, frame = reader.read_latest()
+        assert frame.shape == (48, 64) and numpy.array_equal(frame, gray), "Grayscale frames should read back"
+
+        # A non-contiguous frame is copied into the slot in C order
+        writer.publish(color[:, ::2])
+        header, frame = reader.read_latest()
+        assert numpy.array_equal(frame, color[:, ::2]), "Non-contiguous frames should read back"
+
+        too_big = numpy.zeros((100, 100, 3), dtype=numpy.uint8)
+        assert writer.publish(too_big) is None, "Frames larger than a slot should be skipped"
+    finally:
+        reader.close()
+        writer.close()
+
+    print("✓ Round trip test passed")
+    return True
+
+
+def test_seqlock_detects_rewrites():
+    """Test that readers reject slots being rewritten or reused by the writer"""
+    writer = FrameRingWriter(RING_NAME, slots=3, slot_size=64 * 48 * 3)
+    reader = FrameRingReader(RING_NAME)
+    try:
+        writer.publish(make_frame(1))
+        header, frame = reader.read_latest()
+        assert reader.is_valid(header), "A fresh frame should be valid"
+
+        # The writer zeroes the slot sequence while it copies new pixels in
+        offset = _RING_HEADER_SIZE + (header.sequence % writer.slots) * writer._slot_stride
+        struct.pack_into('<Q', writer.shm.buf, offset, 0)
+        assert not reader.is_valid(header), "A slot being rewritten should not be valid"
+        assert reader.read(header.sequence) == (None, None), "A slot being rewritten should not be read"
+        struct.pack_into('<Q', writer.shm.buf, offset, header.sequence)
+
+        # After a full wrap the slot holds a newer frame
+        for value in range(2, 2 + writer.slots):
+            writer.publish(make_frame(value))
+        assert not reader.is_valid(header), "A reused slot should not be valid"
+        assert reader.read(header.sequence) == (None, None), "An overwritten sequence should not be read"
+
+        # A reader that lost its frame retries with the latest one
+        header, frame = reader.read_latest()
+        assert header.sequence == writer.sequence and frame[1, 1, 0] == writer.slots + 1, \
+            "Retrying should return the newest frame"
+    finally:
+        reader.close()
+        writer.close()
+
+    print("✓ Seqlock test passed")
+    return True
+
+
+def test_ownership():
+    """Test that a reader in another process leaves the block alone and the writer removes it"""
+    writer = FrameRingWriter(RING_NAME, slots=3, slot_size=64 * 48 * 3)
+    try:
+        writer.publish(make_frame(5))
+        script = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.dirname(os.path.abspath(__file__)))!r}); "
+                  f"from frame_ring import FrameRingReader; reader = FrameRingReader({RING_NAME!r}); "
+                  f"print(reader.read_latest()[0].sequence); reader.close()")
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=30)
+        assert output.stdout.strip() == '1', f"The reader process should see the frame: {output.stderr}"
+        assert 'Traceback' not in output.stderr, f"The reader process should exit cleanly: {output.stderr}"
+
+        # Still there after the reader process exited
+        reader = FrameRingReader(RING_NAME)
+        assert reader.latest_sequence == 1, "The block should survive a reader process"
+        reader.close()
+    finally:
+        writer.close()
+
+    assert writer.publish(make_frame(6)) is None, "Publishing after close should be ignored"
+    try:
+        shared_memory.SharedMemory(name=RING_NAME).close()
+        assert False, "The writer should remove the block on close"
+    except FileNotFoundError:
+        pass
+
+    print("✓ Ownership test passed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n=== Frame Ring Tests ===\n")
+
+    tests = [
+        ("Round Trip", test_round_trip),
+        ("Seqlock Detects Rewrites", test_seqlock_detects_rewrites),
+        ("Ownership", test_ownership),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        print(f"Running: {test_name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"✗ Test failed with exception: {e}")
+            failed += 1
+        print()
+
+    print(f"=== Test Results ===")
+    print(f"Passed: {passed}/{len(tests)}")
+    print(f"Failed: {failed}/{len(tests)}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for the capture client / Streamer wire format.
+This test verifies that frames, hellos and control messages survive an
+encode/decode round trip over a socket.
+"""
+
+import os
+import socket
+import sys
+
+import numpy
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from protocol import (DEFAULT_CAMERA_ID, FRAME_HEADER, decode_frame, encode_control, encode_frame,
+                      encode_hello, recv_control, recv_exact_into, recv_hello)
+
+
+def receive_frame(conn, header):
+    """Receive one frame the way the Streamer does: size header, then the payload into a buffer."""
+    size = FRAME_HEADER.unpack(header)[0]
+    payload = bytearray(size)
+    assert recv_exact_into(conn, memoryview(payload)), "Payload should arrive complete"
+    return decode_frame(memoryview(payload))
+
+
+def test_frame_round_trip():
+    """Test that frames decode to the same pixels, shape and dtype"""
+    color = numpy.random.default_rng(1).integers(0, 255, (48, 64, 3), dtype=numpy.uint8)
+    frames = [color, color[:, :, 0].copy(), numpy.asfortranarray(color), numpy.arange(12, dtype=numpy.uint16).reshape(3, 4)]
+
+    for frame in frames:
+        data = bytes(encode_frame(frame))
+        assert FRAME_HEADER.unpack_from(data)[0] == len(data) - FRAME_HEADER.size, "Header should hold the payload size"
+        decoded = decode_frame(memoryview(data)[FRAME_HEADER.size:])
+        assert decoded.shape == frame.shape and decoded.dtype == frame.dtype, "Shape and dtype should be kept"
+        assert numpy.array_equal(decoded, frame), "Pixels should be kept"
+
+    try:
+        decode_frame(memoryview(b'not a numpy payload'))
+        print("✗ A payload without the .npy magic should be rejected")
+        return False
+    except ValueError:
+        pass
+
+    print("✓ Frame round trip test passed")
+    return True
+
+
+def test_handshake_and_control():
+    """Test hello, frames and control messages over a socket pair"""
+    client, server = socket.socketpair()
+    try:
+        frame = numpy.full((8, 8, 3), 7, dtype=numpy.uint8)
+        client.sendall(encode_hello('overhead', width=1024, height=768, fps=30))
+        client.sendall(encode_frame(frame))
+
+        header = bytearray(FRAME_HEADER.size)
+        hello, have_header = recv_hello(server, header)
+        assert hello == {'camera_id': 'overhead', 'width': 1024, 'height': 768, 'fps': 30}, f"Unexpected hello {hello}"
+        assert not have_header, "After a hello the first frame header is still to be read"
+        assert recv_exact_into(server, memoryview(header)), "Frame header should arrive"
+        assert numpy.array_equal(receive_frame(server, header), frame), "Frame after the hello should decode"
+
+        server.sendall(encode_control(fps=1, scale=0.5))
+        assert recv_control(client) == {'fps': 1, 'scale': 0.5}, "Control message should decode"
+
+        # A client that starts with a frame is the default camera and the header is the frame size
+        client.sendall(encode_frame(frame))
+        hello, have_header = recv_hello(server, header)
+        assert hello == {'camera_id': DEFAULT_CAMERA_ID} and have_header, "A frame without hello is the default camera"
+        assert numpy.array_equal(receive_frame(server, header), frame), "First frame without hello should decode"
+
+        server.sendall(encode_hello('bogus'))
+        try:
+            recv_control(client)
+            print("✗ A non-control message from the server should be rejected")
+            return False
+        except ValueError:
+            pass
+
+    finally:
+        client.close()
+        server.close()
+
+    client, server = socket.socketpair()
+    server.close()
+    assert recv_control(client) is None, "A closed connection should end the control stream"
+    client.close()
+
+    print("✓ Handshake and control test passed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n=== Protocol Tests ===\n")
+
+    tests = [
+        ("Frame Round Trip", test_frame_round_trip),
+        ("Handshake And Control", test_handshake_and_control),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        print(f"Running: {test_name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"✗ Test failed with exception: {e}")
+            failed += 1
+        print()
+
+    print(f"=== Test Results ===")
+    print(f"Passed: {passed}/{len(tests)}")
+    print(f"Failed: {failed}/{len(tests)}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,6 @@
 LEGO Robot Agent - Multi-agent orchestration for LEGO robot control.
 """
 
-from .agent import LegoAgent
 from .context import AgentContext
 from .models import RobotData, RoboProcessArgs, Content
 
@@ -15,3 +14,12 @@ __all__ = [
 ]
 
 __version__ = "0.1.0"
+
+
+def __getattr__(name):
+    # The agent stack creates its Azure clients on import; load it on first use so that
+    # the detection package (e.g. in detection service workers) imports without it
+    if name == "LegoAgent":
+        from .agent import LegoAgent
+        return LegoAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,6 +2,7 @@
 LEGO Observer Agent - Captures and analyzes the robot field state.
 """
 
+import asyncio
 import json
 import requests
 from typing import TYPE_CHECKING
@@ -17,14 +18,29 @@ if TYPE_CHECKING:
 _observer_context: "AgentContext" = None
 
 
-async def _process_image(context: "AgentContext"):
-    """Process an image and return field data with detection results."""
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def _process_image(context: "AgentContext", image_data: bytes = None):
+    """
+    Process an image and return field data with detection results.
+
+    ``image_data`` (the encoded photo) is detected in memory; without it the
+    step0 image file is read. With ``LEGO_DETECTION_SERVICE`` set, detection
+    runs on that detection service (authenticated with ``LEGO_DETECTION_TOKEN``)
+    and falls back to in-process detection if the service fails or does not
+    answer within ``LEGO_DETECTION_TIMEOUT``.
+    """
     from ..models import RoboProcessArgs
-    from ..detection import run_detection
+    from ..detection import flush_artifacts, run_detection
+    from ..detection.service import args_options, detect_remote
     
     robot_data = context.robot_data
     args = RoboProcessArgs()
     args.image_path = robot_data.step0_img_path()
+    args.image_data = image_data
     args.method = "color"
     args.templates = None
     args.target_objects = []
@@ -34,8 +50,26 @@ async def _process_image(context: "AgentContext"):
     args.pixels_per_unit = 1.0
     args.no_display = True
     args.no_preprocessing = False
-
-    detection_result = run_detection(args)
+    args.artifacts = "results"
+    # An unchanged field (retries, judge checks) reuses the previous detection
+    args.cache = True
+
+    detection_result = None
+    if shared.DETECTION_SERVICE_URL:
+        try:
+            frame = image_data if image_data is not None else await asyncio.to_thread(_read_file, args.image_path)
+            # The service returns the results; they are only written here, for an answer that came in time
+            detection_result = await detect_remote(shared.DETECTION_SERVICE_URL, frame, options=args_options(args),
+                                                   token=shared.DETECTION_SERVICE_TOKEN, output=args.output,
+                                                   visualize=args.visualize, timeout=shared.DETECTION_SERVICE_TIMEOUT)
+        except Exception as e:
+            print(f"Detection service failed ({e!r}), detecting locally")
+
+    if detection_result is None:
+        # Off the event loop, so other agents keep running during detection
+        detection_result = await asyncio.to_thread(run_detection, args)
+        # The visualization is written in the background and uploaded below
+        await asyncio.to_thread(flush_artifacts)
 
     print(f"Image: " + robot_data.step1_analyze_img())
     
@@ -113,10 +147,13 @@ async def get_field_state_by_camera() -> str:
         response = requests.get(url)
         img_data = response.content
 
-    with open(context.robot_data.step0_img_path(), "wb") as f:
-        f.write(img_data)
+    # Kept as a record of the run; detection reads the bytes directly. Queued off the event loop,
+    # since a required write waits while the writer's queue is full
+    from ..detection import get_artifact_writer
+    await asyncio.to_thread(get_artifact_writer().write_bytes, context.robot_data.step0_img_path(), img_data,
+                            required=True)
 
-    data = await _process_image(context)
+    data = await _process_image(context, img_data)
     return json.dumps(data)
 
 
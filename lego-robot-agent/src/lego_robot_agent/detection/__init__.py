@@ -2,10 +2,38 @@
 Object detection and tracking modules.
 """
 
+from .artifacts import ArtifactWriter, flush_artifacts, get_artifact_writer
+from .batch import combine_burst, detect_batch, detect_frame, detect_yolo_batch
+from .cache import DetectionCache, clear_detection_cache, get_detection_cache
 from .detector import ObjectDetector, create_sample_color_ranges, run_detection
+from .distances import DistanceMatrix
+from .fusion import detect_fused, fuse_detections
+from .profiling import StageProfiler
+from .result import DetectionResult
+from .roi import FieldROI
+from .tracker import ObjectTracker
+from .yolo_models import get_yolo_model
 
 __all__ = [
     "ObjectDetector",
     "create_sample_color_ranges", 
     "run_detection",
+    "DetectionResult",
+    "DistanceMatrix",
+    "FieldROI",
+    "ObjectTracker",
+    "detect_batch",
+    "detect_frame",
+    "detect_yolo_batch",
+    "combine_burst",
+    "get_yolo_model",
+    "ArtifactWriter",
+    "get_artifact_writer",
+    "flush_artifacts",
+    "DetectionCache",
+    "get_detection_cache",
+    "clear_detection_cache",
+    "StageProfiler",
+    "detect_fused",
+    "fuse_detections",
 ]
@@ -0,0 +1,149 @@
+"""
+Background writer for detection artifacts.
+
+Encoding PNGs and JPEGs costs more than a whole downscaled detection, so
+artifacts are handed to a small thread pool instead of being written on the
+request path. At most ``max_pending`` writes are queued; optional (debug)
+artifacts are dropped when the queue is full, required ones wait for a slot.
+
+Which artifacts are produced is chosen by level:
+
+* ``none`` - nothing is written
+* ``results`` - the analysis JSON and the visualization image
+* ``debug`` - results plus a mask and a masked image per color range
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional, Set
+
+import cv2
+import numpy as np
+
+ARTIFACT_LEVELS = ('none', 'results', 'debug')
+
+
+def artifact_level_enabled(level: str, required: str) -> bool:
+    """Whether artifacts of level ``required`` are written at the configured ``level``."""
+    return ARTIFACT_LEVELS.index(level) >= ARTIFACT_LEVELS.index(required)
+
+
+class ArtifactWriter:
+
+    def __init__(self, max_pending: int = 16, workers: int = 2):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='artifacts')
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.pending: Set[Future] = set()
+        self.lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def submit(self, task: Callable[..., Any], *args, required: bool = False) -> bool:
+        """
+        Run ``task(*args)`` in the background.
+
+        Returns False if the task was dropped because the queue is full; with
+        ``required`` the call waits for a free slot instead.
+        """
+        if not self.slots.acquire(blocking=required):
+            with self.lock:
+                self.dropped += 1
+            return False
+
+        future = self.executor.submit(self._run, task, args)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._done)
+        return True
+
+    def _run(self, task: Callable[..., Any], args: tuple):
+        try:
+            task(*args)
+        except Exception as e:
+            print(f"Error writing detection artifact: {e}")
+            return
+        with self.lock:
+            self.written += 1
+
+    def _done(self, future: Future):
+        with self.lock:
+            self.pending.discard(future)
+        self.slots.release()
+
+    def write_image(self, path: str, image: np.ndarray, required: bool = False,
+                    on_encoded: Callable[[bytes], None] = None) -> bool:
+        """
+        Encode and write an image, which must not be modified afterwards.
+
+        ``on_encoded`` is called with the encoded file contents once written.
+        """
+        if on_encoded is None:
+            return self.submit(cv2.imwrite, path, image, required=required)
+        return self.submit(_write_encoded, path, image, on_encoded, required=required)
+
+    def write_masked(self, mask_path: str, masked_path: str, image: np.ndarray, mask: np.ndarray) -> bool:
+        """
+        Debug pair of a mask and the image pixels it selects; the masking itself
+        runs in the background, so neither array may be modified afterwards.
+        """
+        return self.submit(_write_masked, mask_path, masked_path, image, mask)
+
+    def write_bytes(self, path: str, data: bytes, required: bool = False) -> bool:
+        return self.submit(_write_binary, path, data, required=required)
+
+    def write_json(self, path: str, data: Any, required: bool = False) -> bool:
+        # Serialized now so later changes to ``data`` do not leak into the file
+        return self.submit(_write_text, path, json.dumps(data, indent=2), required=required)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for every queued write; False if some were still running after ``timeout`` seconds."""
+        with self.lock:
+            pending = list(self.pending)
+        _, not_done = wait(pending, timeout)
+        return not not_done
+
+
+def _write_text(path: str, text: str):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def _write_binary(path: str, data: bytes):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _write_encoded(path: str, image: np.ndarray, on_encoded: Callable[[bytes], None]):
+    ok, encoded = cv2.imencode(os.path.splitext(path)[1] or '.png', image)
+    if not ok:
+        raise ValueError(f"Could not encode {path}")
+    data = encoded.tobytes()
+    _write_binary(path, data)
+    on_encoded(data)
+
+
+def _write_masked(mask_path: str, masked_path: str, image: np.ndarray, mask: np.ndarray):
+    cv2.imwrite(mask_path, mask)
+    cv2.imwrite(masked_path, cv2.bitwise_and(image, image, mask=mask))
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_artifact_writer() -> ArtifactWriter:
+    """Process-wide artifact writer."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ArtifactWriter()
+        return _writer
+
+
+def flush_artifacts(timeout: Optional[float] = None) -> bool:
+    """Wait for the process-wide writer to finish its queued writes."""
+    with _writer_lock:
+        writer = _writer
+    return writer.flush(timeout) if writer is not None else True
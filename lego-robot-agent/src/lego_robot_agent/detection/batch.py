@@ -0,0 +1,152 @@
+"""
+Thread-parallel batch detection.
+
+``detect_batch`` runs detections for many frames on a shared thread pool.
+OpenCV releases the GIL inside its filters, so color and template detection
+scale across cores. Each worker thread keeps its own ObjectDetector, and with
+it its own segmentation scratch buffers, so callers never share detector
+state and consecutive frames of the same size reuse memory. YOLO batches go
+through the shared model in one batched inference instead.
+"""
+
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence, Union
+
+import cv2
+import numpy as np
+
+from .detector import ObjectDetector, create_sample_color_ranges
+from .yolo_models import DEFAULT_MODEL, get_yolo_model
+
+Frame = Union[np.ndarray, str]
+
+_worker_state = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _thread_detector() -> ObjectDetector:
+    detector = getattr(_worker_state, 'detector', None)
+    if detector is None:
+        detector = _worker_state.detector = ObjectDetector()
+    return detector
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix='detect')
+        return _pool
+
+
+def detect_frame(frame: Frame, method: str = 'color', config: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """
+    Detect objects in one frame (BGR ndarray or image path) with the calling
+    thread's detector.
+
+    ``config`` holds the keyword options of the chosen method, e.g. for color
+    ``color_ranges``, ``use_preprocessing``, ``processing_scale``, ``refine``,
+    ``component_analysis``, ``lut_bits`` and ``field_roi``; ``templates`` and ``threshold`` for
+    template; ``confidence``, ``target_objects``, ``model_path``, ``backend``
+    and ``num_threads`` for yolo.
+    """
+    config = config or {}
+    detector = _thread_detector()
+
+    loaded = detector.load_image(frame) if isinstance(frame, str) else detector.set_image(frame)
+    if not loaded:
+        return []
+    detector.set_field_roi(config.get('field_roi'))
+
+    if method == 'color':
+        return detector.detect_objects_by_color(
+            config.get('color_ranges') or create_sample_color_ranges(),
+            use_preprocessing=config.get('use_preprocessing', True),
+            lut_bits=config.get('lut_bits', 8),
+            processing_scale=config.get('processing_scale', 1.0),
+            refine=config.get('refine', False),
+            component_analysis=config.get('component_analysis', False),
+        )
+    if method == 'template':
+        return detector.detect_objects_by_template(config.get('templates') or [], config.get('threshold', 0.8))
+    if method == 'yolo':
+        return detector.detect_objects_by_yolo(
+            confidence_threshold=config.get('confidence', 0.5),
+            target_objects=config.get('target_objects'),
+            model_path=config.get('model_path', DEFAULT_MODEL),
+            backend=config.get('backend', 'auto'),
+            num_threads=config.get('num_threads'),
+        )
+    raise ValueError(f"Unknown method: {method}")
+
+
+def detect_batch(frames: Sequence[Frame], method: str = 'color', config: Dict[str, Any] = None,
+                 executor: Executor = None) -> List[List[Dict[str, Any]]]:
+    """
+    Detect objects in every frame concurrently.
+
+    Returns one object list per frame, in input order. Runs on a process-wide
+    thread pool unless an ``executor`` is given.
+    """
+    if not frames:
+        return []
+    if method == 'yolo':
+        return detect_yolo_batch(frames, config)
+    if len(frames) == 1:
+        return [detect_frame(frames[0], method, config)]
+
+    executor = executor or _shared_pool()
+    futures = [executor.submit(detect_frame, frame, method, config) for frame in frames]
+    return [future.result() for future in futures]
+
+
+def detect_yolo_batch(frames: Sequence[Frame], config: Dict[str, Any] = None) -> List[List[Dict[str, Any]]]:
+    """YOLO detection for several frames in one batched inference on the shared model."""
+    config = config or {}
+    images = [cv2.imread(frame) if isinstance(frame, str) else frame for frame in frames]
+    valid = [index for index, image in enumerate(images) if image is not None]
+
+    try:
+        model = get_yolo_model(config.get('model_path', DEFAULT_MODEL), config.get('backend', 'auto'),
+                               config.get('num_threads'))
+        detections = model.predict([images[index] for index in valid], config.get('confidence', 0.5)) if valid else []
+    except Exception as e:
+        print(f"Error during YOLO batch detection: {e}")
+        return [[] for _ in frames]
+
+    results = [[] for _ in frames]
+    detector = _thread_detector()
+    for index, rows in zip(valid, detections):
+        detector.set_image(images[index])
+        objects = detector.yolo_objects(rows, config.get('target_objects'))
+        results[index] = detector._filter_objects_by_max_area(objects)
+    return results
+
+
+def combine_burst(results: List[List[Dict[str, Any]]], min_fraction: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Combine detections of a short burst of frames of the same scene.
+
+    An object is kept if it was seen in at least ``min_fraction`` of the
+    frames; the detection closest to its median center represents it, with
+    ``burst_votes`` set to the number of frames it was seen in.
+    """
+    by_name: Dict[str, List[Dict[str, Any]]] = {}
+    for objects in results:
+        for obj in objects:
+            by_name.setdefault(obj['name'], []).append(obj)
+
+    combined = []
+    for name, objects in by_name.items():
+        if len(objects) < min_fraction * len(results):
+            continue
+        centers = np.array([obj['center'] for obj in objects], dtype=np.float64)
+        median = np.median(centers, axis=0)
+        best = objects[int(np.argmin(np.linalg.norm(centers - median, axis=1)))]
+        obj = dict(best)
+        obj['burst_votes'] = len(objects)
+        combined.append(obj)
+    return combined
@@ -0,0 +1,128 @@
+"""
+Frame-keyed detection cache.
+
+Repeated observations of an unchanged field (retries, judge checks, a
+restarted run) return the earlier detection instead of running it again.
+Entries are keyed by a hash of the detection config plus the frame, which is
+matched two ways:
+
+* the digest of the encoded bytes - an identical photo hits without decoding
+* a 48x36 color thumbnail of the decoded frame - a new photo of the same scene
+  hits when no thumbnail cell differs by more than ``tolerance`` levels
+
+The thumbnail comparison uses the largest cell difference rather than a
+Hamming distance between bit hashes, so a small object that moved still misses.
+Entries are evicted least recently used first. One process-wide cache serves
+every detection method, with the method part of the config key. Entries hold
+the read-only DetectionResult, which is handed out without copying.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+
+from .result import DetectionResult
+
+SIGNATURE_SIZE = (48, 36)
+# Re-encoding or re-shooting a static scene moves cells by 1-3 levels, other scenes by 100+
+DEFAULT_TOLERANCE = 6
+
+
+def data_digest(data) -> Optional[bytes]:
+    """Digest of encoded image bytes; None for decoded frames."""
+    if isinstance(data, np.ndarray) and data.ndim >= 2 and data.shape[1] > 1:
+        return None
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def frame_signature(image: np.ndarray) -> np.ndarray:
+    return cv2.resize(image, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    """Stable hash of a JSON-able detection config."""
+    text = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class CacheEntry:
+
+    def __init__(self, config_key: str, digest: Optional[bytes], signature: Optional[np.ndarray],
+                 result: DetectionResult):
+        self.config_key = config_key
+        self.digest = digest
+        self.signature = signature
+        self.result = result
+        # Encoded visualization, set once it has been written
+        self.visualization: Optional[bytes] = None
+
+    def set_visualization(self, data: bytes):
+        self.visualization = data
+
+
+class DetectionCache:
+
+    def __init__(self, max_entries: int = 32, tolerance: float = DEFAULT_TOLERANCE):
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+    def find(self, config_key: str, digest: Optional[bytes] = None, signature: Optional[np.ndarray] = None,
+             tolerance: Optional[float] = None) -> Optional[CacheEntry]:
+        """Most recent entry for the config matching the digest or, failing that, the signature."""
+        tolerance = self.tolerance if tolerance is None else tolerance
+        with self.lock:
+            for entry_id, entry in reversed(self.entries.items()):
+                if entry.config_key != config_key:
+                    continue
+                if digest is not None and entry.digest == digest:
+                    break
+                if (signature is not None and entry.signature is not None
+                        and entry.signature.shape == signature.shape
+                        and cv2.norm(entry.signature, signature, cv2.NORM_INF) <= tolerance):
+                    break
+            else:
+                return None
+
+            self.entries.move_to_end(entry_id)
+            return entry
+
+    def store(self, config_key: str, digest: Optional[bytes], signature: Optional[np.ndarray],
+              result: DetectionResult) -> CacheEntry:
+        entry = CacheEntry(config_key, digest, signature, result)
+        with self.lock:
+            self.entries[self.next_id] = entry
+            self.next_id += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_detection_cache() -> DetectionCache:
+    """Process-wide detection cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DetectionCache()
+        return _cache
+
+
+def clear_detection_cache():
+    with _cache_lock:
+        if _cache is not None:
+            _cache.clear()
@@ -0,0 +1,106 @@
+"""
+In-memory frame decoding.
+
+Frames arrive from the camera as JPEG bytes, so they are decoded with
+``cv2.imdecode`` instead of being written to disk and read back. When the
+detection runs below full resolution anyway, JPEGs are decoded at 1/2 or 1/4
+size (``IMREAD_REDUCED_COLOR_*``), which lets libjpeg skip most of the inverse
+DCT work. The full frame size is read from the file header, so detections can
+still be reported in full-resolution pixels.
+"""
+
+import struct
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+ImageData = Union[bytes, bytearray, memoryview, np.ndarray]
+
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+}
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Start-of-frame markers; 0xC4, 0xC8 and 0xCC share the range but are not frames
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def reduction_for_scale(processing_scale: float) -> int:
+    """Largest supported decode reduction that still leaves at least ``processing_scale`` of the resolution."""
+    for reduction in (4, 2):
+        if processing_scale <= 1.0 / reduction:
+            return reduction
+    return 1
+
+
+def reduction_for_size(frame_size: Optional[Tuple[int, int]], min_side: int) -> int:
+    """Largest supported decode reduction that keeps the longer frame side at ``min_side`` pixels or more."""
+    if frame_size is None:
+        return 1
+    for reduction in (4, 2):
+        if max(frame_size) // reduction >= min_side:
+            return reduction
+    return 1
+
+
+def encoded_image_size(data: ImageData) -> Optional[Tuple[int, int]]:
+    """(width, height) from a JPEG or PNG header, or None for other or broken data."""
+    if isinstance(data, np.ndarray):
+        view = memoryview(np.ascontiguousarray(data, dtype=np.uint8).reshape(-1))
+    else:
+        view = memoryview(data).cast('B')
+    length = len(view)
+
+    if length >= 24 and bytes(view[:8]) == _PNG_SIGNATURE:
+        width, height = struct.unpack_from('>II', view, 16)
+        return width, height
+
+    if length < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    index = 2
+    while index + 4 <= length:
+        if view[index] != 0xFF:
+            return None
+        marker = view[index + 1]
+        if marker == 0xFF:
+            index += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            index += 2
+            continue
+        segment_length = struct.unpack_from('>H', view, index + 2)[0]
+        if marker in _JPEG_SOF:
+            if index + 9 > length:
+                return None
+            height, width = struct.unpack_from('>HH', view, index + 5)
+            return width, height
+        index += 2 + segment_length
+    return None
+
+
+def decode_frame(data: ImageData, reduction: int = 1) -> Tuple[Optional[np.ndarray], Tuple[int, int]]:
+    """
+    Decode an encoded frame, optionally at 1/``reduction`` of its size.
+
+    Returns the BGR image (None if the data cannot be decoded) and the
+    (width, height) of the frame at full resolution.
+    """
+    buffer = data if isinstance(data, np.ndarray) else np.frombuffer(data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, REDUCED_FLAGS.get(reduction, cv2.IMREAD_COLOR))
+    if image is None:
+        return None, (0, 0)
+
+    height, width = image.shape[:2]
+    if reduction == 1:
+        return image, (width, height)
+
+    size = encoded_image_size(buffer)
+    if size is not None and (size[0] > size[1]) != (width > height):
+        # EXIF orientation was applied by the decoder
+        size = (size[1], size[0])
+    if size is None or (-(-size[0] // reduction), -(-size[1] // reduction)) != (width, height):
+        size = (width * reduction, height * reduction)
+    return image, size
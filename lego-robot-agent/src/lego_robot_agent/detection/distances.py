@@ -0,0 +1,85 @@
+"""
+Pairwise distances and bearings between detected objects.
+
+All pairwise distances and bearings are computed in one NumPy broadcast; callers
+then pick the pairs they need. Pairs are given as (from, to) endpoints that are
+either object names or roles, where roles map to object names so that the same
+pair configuration works for other fields and objects. ``'*'`` as the ``to``
+endpoint means every other object.
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Role -> object name on the default field
+DEFAULT_ROLES = {
+    'agent': 'robot',
+    'target': 'coke',
+    'goal': 'bowser',
+}
+
+# Pairs reported by get_object_analysis
+DEFAULT_PAIRS = [('agent', 'target'), ('agent', 'goal'), ('target', 'goal')]
+
+# Pairs drawn by visualize_results
+DEFAULT_VISUAL_PAIRS = [('agent', '*')]
+
+
+class DistanceMatrix:
+    """
+    Distances and bearings between every pair of objects.
+
+    ``positions`` are 2D coordinates (origin bottom-left, y up). Bearings are
+    in degrees counter-clockwise from the +x axis, from row object to column
+    object. ``distances`` are in units (pixels / pixels_per_unit).
+    """
+
+    def __init__(self, names: Sequence[str], positions: np.ndarray, pixels_per_unit: float = 1.0):
+        self.names = list(names)
+        self.keys = [name.lower() for name in self.names]
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        self.pixels_per_unit = pixels_per_unit
+
+        delta = self.positions[None, :, :] - self.positions[:, None, :]
+        dx, dy = delta[..., 0], delta[..., 1]
+        self.pixels = np.sqrt(dx * dx + dy * dy)
+        self.distances = self.pixels / pixels_per_unit
+        self.bearings = np.degrees(np.arctan2(dy, dx))
+
+    def indices(self, endpoint: str, roles: Dict[str, str] = None) -> List[int]:
+        """Indices of the objects an endpoint (role or name, case-insensitive) refers to."""
+        roles = DEFAULT_ROLES if roles is None else roles
+        name = roles.get(endpoint, endpoint).lower()
+        return [index for index, key in enumerate(self.keys) if key == name]
+
+    def select(self, pairs: Sequence[Tuple[str, str]] = None, roles: Dict[str, str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Row and column indices of the requested pairs, in request order."""
+        pairs = DEFAULT_PAIRS if pairs is None else pairs
+        rows, cols = [], []
+        for source, target in pairs:
+            for i in self.indices(source, roles):
+                targets = [j for j in range(len(self.names)) if j != i] if target == '*' else self.indices(target, roles)
+                for j in targets:
+                    if j != i:
+                        rows.append(i)
+                        cols.append(j)
+        return np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+
+    def pair_entries(self, pairs: Sequence[Tuple[str, str]] = None, roles: Dict[str, str] = None,
+                     positions_2d: Sequence[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
+        """Analysis entries for the requested pairs."""
+        rows, cols = self.select(pairs, roles)
+        positions = positions_2d if positions_2d is not None else [tuple(p) for p in self.positions.tolist()]
+        distances = self.distances[rows, cols].tolist()
+        bearings = self.bearings[rows, cols].tolist()
+
+        return [{
+            'from': self.names[i],
+            'to': self.names[j],
+            'distance_pixels': distance * self.pixels_per_unit,
+            'distance_units': distance,
+            'bearing_degrees': bearing,
+            'from_position': positions[i],
+            'to_position': positions[j],
+        } for i, j, distance, bearing in zip(rows.tolist(), cols.tolist(), distances, bearings)]
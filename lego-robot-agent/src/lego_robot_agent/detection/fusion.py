@@ -0,0 +1,204 @@
+"""
+Concurrent multi-method detection with result fusion.
+
+``detect_fused`` runs color, template and YOLO detection on the same frame on
+a thread pool (OpenCV and the inference backends release the GIL), each with
+its own deadline, so a slow or stuck method is left out of the result instead
+of delaying the observation. A timed-out call keeps running in the background;
+until it finishes the method is skipped rather than started again, so stuck
+work cannot pile up in the pool. The detections that arrived in time are then
+reconciled:
+
+* names are mapped to one vocabulary (``class_map``: e.g. COCO 'bottle' ->
+  'coke', template 'object_1' -> the template's file name)
+* detections of the same name whose boxes overlap (IoU >= ``iou_threshold``)
+  are merged; the merged center is the confidence-weighted mean, the box comes
+  from the most confident member, area and orientation from the most confident
+  member of a method that measures them (the color contours; template and YOLO
+  boxes are axis-aligned), and the confidence combines the members' as
+  1 - prod(1 - confidence)
+* one object per name is kept, the most confident one
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import detect_frame
+
+# COCO classes a soda can is commonly reported as
+DEFAULT_CLASS_MAP = {
+    'bottle': 'coke',
+    'cup': 'coke',
+}
+
+# Color detections carry no score; this is their confidence in the fusion
+COLOR_CONFIDENCE = 0.6
+
+# Methods whose area and orientation come from the object's contour rather than its box
+SHAPE_METHODS = ('color',)
+
+DEFAULT_TIMEOUTS = {
+    'color': 5.0,
+    'template': 5.0,
+    'yolo': 5.0,
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+# The last call of each method; at most one is in flight per method
+_in_flight: Dict[str, Future] = {}
+
+
+def _submit(method: str, *args) -> Optional[Future]:
+    """Start a method on the fusion pool, or None if its previous call is still running."""
+    global _pool
+    with _pool_lock:
+        previous = _in_flight.get(method)
+        if previous is not None and not previous.done():
+            return None
+        if _pool is None:
+            # One thread per method, as no method runs twice at a time
+            _pool = ThreadPoolExecutor(max_workers=len(DEFAULT_TIMEOUTS), thread_name_prefix='fusion')
+        future = _pool.submit(*args)
+        _in_flight[method] = future
+        return future
+
+
+def template_class_map(template_paths: Sequence[str]) -> Dict[str, str]:
+    """Map the template detector's 'object_N' names to the template file names."""
+    return {f'object_{i+1}': os.path.splitext(os.path.basename(path))[0] for i, path in enumerate(template_paths)}
+
+
+def box_iou(a: Sequence[float], b: Sequence[float]) -> float:
+    """IoU of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0.0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0.0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def fuse_detections(results: Dict[str, List[Dict[str, Any]]], image_height: int,
+                    class_map: Dict[str, str] = None, iou_threshold: float = 0.3,
+                    weights: Dict[str, float] = None) -> List[Dict[str, Any]]:
+    """
+    Reconcile per-method detections (method -> objects) into one object per name.
+
+    ``weights`` scales each method's confidences (default 1).
+    """
+    class_map = DEFAULT_CLASS_MAP if class_map is None else class_map
+    weights = weights or {}
+
+    candidates = []
+    for method, objects in results.items():
+        for obj in objects:
+            confidence = obj.get('confidence', COLOR_CONFIDENCE if method == 'color' else 0.5)
+            confidence = min(1.0, max(0.0, confidence * weights.get(method, 1.0)))
+            candidates.append((class_map.get(obj['name'], obj['name']), confidence, method, obj))
+    candidates.sort(key=lambda candidate: -candidate[1])
+
+    # Greedy clustering, most confident first: each cluster is led by its best member
+    clusters: List[List[Tuple[str, float, str, Dict[str, Any]]]] = []
+    for candidate in candidates:
+        name, _, _, obj = candidate
+        for cluster in clusters:
+            if cluster[0][0] == name and box_iou(cluster[0][3]['bounding_box'], obj['bounding_box']) >= iou_threshold:
+                cluster.append(candidate)
+                break
+        else:
+            clusters.append([candidate])
+
+    fused_by_name: Dict[str, Dict[str, Any]] = {}
+    for cluster in clusters:
+        name, _, _, best = cluster[0]
+        shape = next((obj for _, _, method, obj in cluster if method in SHAPE_METHODS), best)
+        confidences = np.array([confidence for _, confidence, _, _ in cluster])
+        centers = np.array([obj['center'] for _, _, _, obj in cluster], dtype=np.float64)
+        if confidences.sum() > 0:
+            center_x, center_y = (int(round(v)) for v in np.average(centers, axis=0, weights=confidences))
+        else:
+            center_x, center_y = best['center']
+
+        fused = {
+            'name': name,
+            'center': (center_x, center_y),
+            'coordinates_2d': (center_x, image_height - center_y),
+            'bounding_box': best['bounding_box'],
+            'area': shape['area'],
+            'orientation_angle': shape['orientation_angle'],
+            'confidence': float(1.0 - np.prod(1.0 - confidences)),
+            'detection_method': 'fused',
+            'methods': sorted({method for _, _, method, _ in cluster}),
+        }
+        if name not in fused_by_name or fused['confidence'] > fused_by_name[name]['confidence']:
+            fused_by_name[name] = fused
+
+    return list(fused_by_name.values())
+
+
+def _timed_detect(frame: np.ndarray, method: str, config: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], float]:
+    started = time.perf_counter()
+    objects = detect_frame(frame, method, config)
+    return objects, time.perf_counter() - started
+
+
+def detect_fused(frame: np.ndarray, configs: Dict[str, Dict[str, Any]], timeouts: Dict[str, float] = None,
+                 class_map: Dict[str, str] = None, iou_threshold: float = 0.3,
+                 weights: Dict[str, float] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Run several detection methods on one frame concurrently and fuse their results.
+
+    ``configs`` maps each method to run ('color', 'template', 'yolo') to its
+    ``detect_frame`` config. Every method gets ``timeouts[method]`` seconds
+    from the start; methods that miss their deadline or fail are left out, and
+    so are methods still busy with an earlier call (also one from another
+    thread).
+
+    Returns the fused objects and a per-method report with ``status`` ('ok',
+    'timeout', 'error' or 'skipped'), ``objects`` and ``elapsed_ms`` (the
+    method's own run time, or the time waited for it).
+    """
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    started = time.perf_counter()
+    futures = {}
+    report: Dict[str, Dict[str, Any]] = {}
+    for method, config in configs.items():
+        future = _submit(method, _timed_detect, frame, method, config)
+        if future is None:
+            report[method] = {'status': 'skipped', 'objects': 0, 'elapsed_ms': 0.0}
+        else:
+            futures[method] = future
+
+    deadlines = {method: started + timeouts.get(method, max(DEFAULT_TIMEOUTS.values())) for method in futures}
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    # Earliest deadline first, so a result that arrived late is not picked up while waiting for another method
+    for method in sorted(futures, key=deadlines.get):
+        future = futures[method]
+        remaining = deadlines[method] - time.perf_counter()
+        try:
+            results[method], elapsed = future.result(timeout=max(0.0, remaining))
+            status = 'ok'
+        except TimeoutError:
+            # The worker keeps running and its result is discarded
+            status = 'timeout'
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            print(f"Error during {method} detection: {e}")
+            status = 'error'
+            elapsed = time.perf_counter() - started
+        report[method] = {
+            'status': status,
+            'objects': len(results.get(method, [])),
+            'elapsed_ms': elapsed * 1000,
+        }
+
+    report = {method: report[method] for method in configs}
+    return fuse_detections(results, frame.shape[0], class_map, iou_threshold, weights), report
@@ -0,0 +1,246 @@
+"""
+Columnar detection results.
+
+A DetectionResult holds one frame's detections as NumPy columns instead of one
+dict per object: names and detection methods as category codes, and centers,
+boxes, areas, angles and confidences as arrays. Contours are packed into one
+point array with per-object offsets and only materialized when asked for.
+This keeps memory use and serialization time small and proportional to the
+number of objects, which matters once results are kept as history for
+tracking or replay.
+
+Results are read-only once built, so the detection cache and the tracker
+history hand out the same instance without copying it. ``analysis`` is the
+object and distance report ``run_detection`` returns and writes as JSON;
+``to_dict``/``to_json`` are the columnar view.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .distances import DistanceMatrix
+
+
+def _value(value: float, integral: bool):
+    """A column value as the type the detector reported it in."""
+    return int(value) if integral else value
+
+
+class DetectionResult:
+
+    def __init__(self, categories: Sequence[str], codes: np.ndarray, centers: np.ndarray, boxes: np.ndarray,
+                 areas: np.ndarray, angles: np.ndarray, confidences: np.ndarray,
+                 methods: Sequence[str] = (), method_codes: np.ndarray = None,
+                 image_size: Tuple[int, int] = (0, 0),
+                 contour_points: np.ndarray = None, contour_offsets: np.ndarray = None,
+                 integral: np.ndarray = None, class_ids: np.ndarray = None, track_ids: np.ndarray = None,
+                 timestamp: float = None):
+        count = len(codes)
+        self.categories = tuple(categories)
+        self.codes = np.array(codes, dtype=np.int16)
+        self.centers = np.array(centers, dtype=np.int32).reshape(-1, 2)
+        self.boxes = np.array(boxes, dtype=np.int32).reshape(-1, 4)
+        self.areas = np.array(areas, dtype=np.float64)
+        self.angles = np.array(angles, dtype=np.float64)
+        # NaN where the method gives no confidence
+        self.confidences = np.array(confidences, dtype=np.float64)
+        self.methods = tuple(methods)
+        self.method_codes = (np.array(method_codes, dtype=np.int8) if method_codes is not None
+                             else np.full(count, -1, dtype=np.int8))
+        # Whether area and angle (columns) were reported as ints, so they are given back as ints
+        self.integral = (np.array(integral, dtype=bool).reshape(-1, 2) if integral is not None
+                         else np.zeros((count, 2), dtype=bool))
+        # -1 where not set
+        self.class_ids = (np.array(class_ids, dtype=np.int32) if class_ids is not None
+                          else np.full(count, -1, dtype=np.int32))
+        self.track_ids = (np.array(track_ids, dtype=np.int32) if track_ids is not None
+                          else np.full(count, -1, dtype=np.int32))
+        self.image_size = (int(image_size[0]), int(image_size[1]))
+        self.contour_points = contour_points
+        self.contour_offsets = contour_offsets
+        self.timestamp = timestamp
+
+        for array in self._arrays():
+            array.flags.writeable = False
+
+    @classmethod
+    def empty(cls, image_size: Tuple[int, int] = (0, 0), timestamp: float = None) -> 'DetectionResult':
+        return cls([], [], np.zeros((0, 2)), np.zeros((0, 4)), [], [], [], image_size=image_size, timestamp=timestamp)
+
+    @classmethod
+    def from_objects(cls, objects: List[Dict[str, Any]], image_size: Tuple[int, int] = (0, 0),
+                     keep_contours: bool = True, timestamp: float = None) -> 'DetectionResult':
+        """Build from the per-object dicts returned by the ObjectDetector methods."""
+        if not objects:
+            return cls.empty(image_size, timestamp)
+
+        categories: Dict[str, int] = {}
+        methods: Dict[str, int] = {}
+        codes = [categories.setdefault(obj['name'], len(categories)) for obj in objects]
+        method_codes = [methods.setdefault(obj['detection_method'], len(methods)) if 'detection_method' in obj else -1
+                        for obj in objects]
+
+        contour_points = contour_offsets = None
+        if keep_contours and any('contour' in obj for obj in objects):
+            contours = [np.asarray(obj['contour'], dtype=np.int32).reshape(-1, 2) if 'contour' in obj
+                        else np.zeros((0, 2), dtype=np.int32) for obj in objects]
+            contour_offsets = np.zeros(len(objects) + 1, dtype=np.int64)
+            np.cumsum([len(contour) for contour in contours], out=contour_offsets[1:])
+            contour_points = np.concatenate(contours)
+
+        return cls(
+            categories=list(categories),
+            codes=codes,
+            centers=[obj['center'] for obj in objects],
+            boxes=[obj['bounding_box'] for obj in objects],
+            areas=[obj['area'] for obj in objects],
+            angles=[obj['orientation_angle'] for obj in objects],
+            confidences=[obj.get('confidence', np.nan) for obj in objects],
+            methods=list(methods),
+            method_codes=method_codes,
+            image_size=image_size,
+            contour_points=contour_points,
+            contour_offsets=contour_offsets,
+            integral=[(isinstance(obj['area'], (int, np.integer)), isinstance(obj['orientation_angle'], (int, np.integer)))
+                      for obj in objects],
+            class_ids=[obj.get('class_id', -1) for obj in objects],
+            track_ids=[obj.get('track_id', -1) for obj in objects],
+            timestamp=timestamp,
+        )
+
+    def _arrays(self) -> List[np.ndarray]:
+        arrays = [self.codes, self.centers, self.boxes, self.areas, self.angles, self.confidences,
+                  self.method_codes, self.integral, self.class_ids, self.track_ids]
+        if self.contour_points is not None:
+            arrays += [self.contour_points, self.contour_offsets]
+        return arrays
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self.object(index)
+
+    def __iter__(self):
+        return (self.object(index) for index in range(len(self)))
+
+    @property
+    def names(self) -> List[str]:
+        return [self.categories[code] for code in self.codes.tolist()]
+
+    @property
+    def coordinates_2d(self) -> np.ndarray:
+        """Centers with the origin at the bottom-left and y pointing up."""
+        coordinates = self.centers.copy()
+        coordinates[:, 1] = self.image_size[1] - coordinates[:, 1]
+        return coordinates
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays())
+
+    def area_values(self) -> list:
+        return [_value(area, integral) for area, integral in zip(self.areas.tolist(), self.integral[:, 0].tolist())]
+
+    def angle_values(self) -> list:
+        return [_value(angle, integral) for angle, integral in zip(self.angles.tolist(), self.integral[:, 1].tolist())]
+
+    def index_of(self, name: str) -> Optional[int]:
+        """Index of the first object with a name, or None."""
+        if name not in self.categories:
+            return None
+        matches = np.flatnonzero(self.codes == self.categories.index(name))
+        return int(matches[0]) if len(matches) else None
+
+    def contour(self, index: int) -> Optional[np.ndarray]:
+        """Contour of one object in cv2 layout (N, 1, 2), or None if not kept."""
+        if self.contour_points is None:
+            return None
+        start, end = self.contour_offsets[index], self.contour_offsets[index + 1]
+        if start == end:
+            return None
+        return self.contour_points[start:end].reshape(-1, 1, 2)
+
+    def object(self, index: int, with_contour: bool = False) -> Dict[str, Any]:
+        """One detection in the ObjectDetector dict format."""
+        x, y = self.centers[index].tolist()
+        area_integral, angle_integral = self.integral[index].tolist()
+        obj = {
+            'name': self.categories[self.codes[index]],
+            'center': (x, y),
+            'coordinates_2d': (x, self.image_size[1] - y),
+            'bounding_box': tuple(self.boxes[index].tolist()),
+            'area': _value(float(self.areas[index]), area_integral),
+            'orientation_angle': _value(float(self.angles[index]), angle_integral),
+        }
+        if not np.isnan(self.confidences[index]):
+            obj['confidence'] = float(self.confidences[index])
+        if self.class_ids[index] >= 0:
+            obj['class_id'] = int(self.class_ids[index])
+        if self.method_codes[index] >= 0:
+            obj['detection_method'] = self.methods[self.method_codes[index]]
+        if self.track_ids[index] >= 0:
+            obj['track_id'] = int(self.track_ids[index])
+        if with_contour:
+            contour = self.contour(index)
+            if contour is not None:
+                obj['contour'] = contour
+        return obj
+
+    def to_objects(self, with_contours: bool = False) -> List[Dict[str, Any]]:
+        return [self.object(index, with_contours) for index in range(len(self))]
+
+    def analysis(self, pixels_per_unit: float = 1.0, pairs: List[Tuple[str, str]] = None,
+                 roles: Dict[str, str] = None) -> Dict[str, Any]:
+        """Objects and the distances between them, see ``ObjectDetector.get_object_analysis``."""
+        if len(self) < 2:
+            return {
+                'error': 'At least 2 objects required for distance analysis',
+                'objects_detected': len(self)
+            }
+
+        names = self.names
+        coordinates = self.coordinates_2d
+        positions = [tuple(position) for position in coordinates.tolist()]
+        centers = [tuple(center) for center in self.centers.tolist()]
+        objects = [{
+            'id': i,
+            'name': name,
+            'position_2d': position,
+            'center_pixels': center,
+            'area_pixels': area,
+            'orientation_degrees': angle,
+        } for i, (name, position, center, area, angle) in
+            enumerate(zip(names, positions, centers, self.area_values(), self.angle_values()))]
+
+        matrix = DistanceMatrix(names, coordinates, pixels_per_unit)
+        return {
+            'image_dimensions': self.image_size,
+            'coordinate_system': '2D with origin at bottom-left, y-axis pointing up',
+            'objects': objects,
+            'distances': matrix.pair_entries(pairs, roles, positions),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Columnar, JSON-ready view (one list per field, contours left out)."""
+        data = {
+            'image_size': list(self.image_size),
+            'names': self.names,
+            'centers': self.centers.tolist(),
+            'coordinates_2d': self.coordinates_2d.tolist(),
+            'bounding_boxes': self.boxes.tolist(),
+            'areas': self.area_values(),
+            'orientation_angles': self.angle_values(),
+            'confidences': [None if np.isnan(value) else value for value in self.confidences.tolist()],
+            'detection_methods': [self.methods[code] if code >= 0 else None for code in self.method_codes.tolist()],
+        }
+        if (self.track_ids >= 0).any():
+            data['track_ids'] = self.track_ids.tolist()
+        if self.timestamp is not None:
+            data['timestamp'] = self.timestamp
+        return data
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
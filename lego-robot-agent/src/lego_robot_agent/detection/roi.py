@@ -0,0 +1,119 @@
+"""
+Field region of interest and per-class search regions.
+
+Regions are polygons in normalized image coordinates (0..1, origin top-left), so
+one configuration works at any camera resolution. The field ROI is read from
+the same calibration file lego-cam uses for rectification: an explicit
+``field_roi`` polygon in raw-frame pixels of ``image_size`` if present,
+otherwise the ``field_corners``. Those are positions in the undistorted image,
+so with a lens model (``camera_matrix``, ``dist_coeffs``) the field edges are
+sampled and mapped back into the raw, distorted frame the ROI masks.
+"""
+
+import json
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+def region_contains(region: Sequence[Sequence[float]], x: float, y: float,
+                    image_width: int, image_height: int) -> bool:
+    """Whether pixel (x, y) lies strictly inside a normalized polygon."""
+    polygon = np.float32(region) * np.float32([image_width, image_height])
+    return cv2.pointPolygonTest(polygon.reshape(-1, 1, 2), (float(x), float(y)), False) > 0
+
+
+def regions_contain(region: Sequence[Sequence[float]], xs: np.ndarray, ys: np.ndarray,
+                    image_width: int, image_height: int) -> np.ndarray:
+    """Vectorized ``region_contains`` for arrays of pixel positions (even-odd rule)."""
+    polygon = np.float64(region) * np.float64([image_width, image_height])
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    inside = np.zeros(xs.shape, dtype=bool)
+    for (x1, y1), (x2, y2) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        if y1 == y2:
+            continue
+        crosses = (y1 > ys) != (y2 > ys)
+        edge_x = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (xs < edge_x)
+    return inside
+
+
+# Points per field edge when mapping the corners through the lens distortion
+EDGE_SAMPLES = 16
+
+
+def distort_points(points: np.ndarray, camera_matrix: Sequence[Sequence[float]],
+                   dist_coeffs: Optional[Sequence[float]]) -> np.ndarray:
+    """Raw-frame pixel positions of undistorted-image pixels (the inverse of ``cv2.undistortPoints``)."""
+    camera_matrix = np.float64(camera_matrix)
+    dist_coeffs = np.float64(dist_coeffs if dist_coeffs is not None else [0, 0, 0, 0, 0])
+    points = np.float64(points).reshape(-1, 2)
+    # lego-cam undistorts with the camera matrix as the new camera matrix
+    normalized = np.hstack([points, np.ones((len(points), 1))]) @ np.linalg.inv(camera_matrix).T
+    distorted, _ = cv2.projectPoints(normalized.reshape(-1, 1, 3), np.zeros(3), np.zeros(3),
+                                     camera_matrix, dist_coeffs)
+    return distorted.reshape(-1, 2)
+
+
+def field_outline(corners: Sequence[Sequence[float]], camera_matrix: Sequence[Sequence[float]],
+                  dist_coeffs: Optional[Sequence[float]], samples: int = EDGE_SAMPLES) -> np.ndarray:
+    """The field edges between undistorted ``corners``, as a polygon in the raw frame."""
+    corners = np.float64(corners)
+    steps = np.arange(samples)[:, None] / samples
+    edges = [start + steps * (end - start) for start, end in zip(corners, np.roll(corners, -1, axis=0))]
+    return distort_points(np.vstack(edges), camera_matrix, dist_coeffs)
+
+
+class FieldROI:
+    """The playing field as a polygon, used to restrict detection to the field."""
+
+    def __init__(self, polygon: Sequence[Sequence[float]], image_size: Optional[Sequence[int]] = None):
+        polygon = np.float32(polygon)
+        if polygon.ndim != 2 or polygon.shape[0] < 3 or polygon.shape[1] != 2:
+            raise ValueError("Field ROI must be a polygon of at least 3 [x, y] points")
+        if image_size is not None:
+            polygon = polygon / np.float32(image_size)
+        self.polygon = np.clip(polygon, 0.0, 1.0)
+
+    @classmethod
+    def from_calibration(cls, path: str, camera_id: str = 'default') -> 'FieldROI':
+        """Load the field polygon of one camera from a lego-cam calibration file."""
+        with open(path) as f:
+            calibration = json.load(f)[camera_id]
+        polygon = calibration.get('field_roi')
+        if polygon is None:
+            polygon = calibration.get('field_corners')
+            if polygon is None:
+                raise ValueError(f"Calibration for '{camera_id}' has no field_roi or field_corners")
+            if calibration.get('camera_matrix') is not None:
+                polygon = field_outline(polygon, calibration['camera_matrix'], calibration.get('dist_coeffs'))
+        return cls(polygon, calibration.get('image_size'))
+
+    def pixel_polygon(self, image_width: int, image_height: int) -> np.ndarray:
+        return np.rint(self.polygon * np.float32([image_width, image_height])).astype(np.int32)
+
+    def crop_box(self, image_width: int, image_height: int, margin: int = 0) -> Tuple[int, int, int, int]:
+        """Bounding box (x0, y0, x1, y1) of the field in pixels, padded and clipped to the image."""
+        x, y, w, h = cv2.boundingRect(self.pixel_polygon(image_width, image_height))
+        return (max(0, x - margin), max(0, y - margin),
+                min(image_width, x + w + margin), min(image_height, y + h + margin))
+
+    def mask(self, image_width: int, image_height: int, crop_box: Tuple[int, int, int, int] = None,
+             shape: Tuple[int, int] = None) -> np.ndarray:
+        """
+        0/255 mask of the field for the crop ``crop_box`` of a full frame,
+        rendered at ``shape`` (height, width) if the crop was downscaled.
+        """
+        x0, y0, x1, y1 = crop_box or (0, 0, image_width, image_height)
+        height, width = shape or (y1 - y0, x1 - x0)
+        scale = np.float32([width / (x1 - x0), height / (y1 - y0)])
+        points = (self.polygon * np.float32([image_width, image_height]) - np.float32([x0, y0])) * scale
+
+        mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(mask, [np.rint(points).astype(np.int32)], 255)
+        return mask
+
+    def to_list(self) -> List[List[float]]:
+        return self.polygon.tolist()
@@ -0,0 +1,162 @@
+"""
+Single-pass multi-class color segmentation.
+
+Instead of one ``cv2.inRange`` pass per color range, the configured ranges are
+compiled once into a 3D lookup table from (quantised) BGR to a class bitmask.
+Every pixel is then labelled for all classes with one vectorized lookup, so the
+cost of labelling does not grow with the number of classes.
+"""
+
+import json
+import sys
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+# One bit per class in the label map
+MAX_CLASSES = 8
+
+
+class ColorLUT:
+    """
+    Lookup table from BGR color to a bitmask of the color ranges it falls into.
+
+    With ``bits=8`` the table is exact (16 MB) and gives the same masks as
+    ``cv2.inRange``; fewer bits shrink the table to ``2**(3*bits)`` entries and
+    classify each quantisation bin by its center color.
+    """
+
+    def __init__(self, color_ranges: List[Dict[str, Any]], bits: int = 8):
+        if len(color_ranges) > MAX_CLASSES:
+            raise ValueError(f"At most {MAX_CLASSES} color ranges are supported, got {len(color_ranges)}")
+        if not 1 <= bits <= 8:
+            raise ValueError(f"LUT bits must be between 1 and 8, got {bits}")
+
+        self.names = [color_range['name'] for color_range in color_ranges]
+        self.bits = bits
+        self.shift = 8 - bits
+
+        levels = 1 << bits
+        centers = (np.arange(levels) << self.shift) + ((1 << self.shift) >> 1)
+
+        # Indexed [r, g, b] so that a BGRA pixel read as a little-endian uint32 is the index
+        table = np.zeros((levels, levels, levels), dtype=np.uint8)
+        for index, color_range in enumerate(color_ranges):
+            lower = color_range['lower']
+            upper = color_range['upper']
+            b, g, r = [(centers >= lower[c]) & (centers <= upper[c]) for c in range(3)]
+            box = r[:, None, None] & g[None, :, None] & b[None, None, :]
+            table[box] |= np.uint8(1 << index)
+
+        self.table = table.reshape(-1)
+
+    def label(self, image: np.ndarray, scratch: Dict[str, np.ndarray] = None) -> np.ndarray:
+        """
+        Class bitmask for every pixel of a BGR image, in one lookup.
+
+        With a ``scratch`` dict the intermediate and output buffers are kept in
+        it and reused by later calls at the same resolution, so the returned
+        label map is only valid until the next call with the same scratch.
+        """
+        if self.bits == 8 and sys.byteorder == 'little':
+            if scratch is None:
+                # 0xAARRGGBB per pixel; dropping alpha leaves the table index
+                packed = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA).view(np.uint32)[..., 0]
+                return self.table.take(np.bitwise_and(packed, 0xFFFFFF))
+
+            shape = image.shape[:2]
+            bgra = _scratch_buffer(scratch, 'bgra', shape + (4,), np.uint8)
+            index = _scratch_buffer(scratch, 'index', shape, np.uint32)
+            labels = _scratch_buffer(scratch, 'labels', shape, np.uint8)
+            cv2.cvtColor(image, cv2.COLOR_BGR2BGRA, dst=bgra)
+            np.bitwise_and(bgra.view(np.uint32)[..., 0], 0xFFFFFF, out=index)
+            return self.table.take(index, out=labels, mode='clip')
+        else:
+            bits = self.bits
+            quantised = image >> self.shift if self.shift else image
+            b = quantised[..., 0].astype(np.uint32)
+            g = quantised[..., 1].astype(np.uint32)
+            r = quantised[..., 2].astype(np.uint32)
+            index = (r << (2 * bits)) | (g << bits) | b
+        return self.table.take(index)
+
+    def masks(self, labels: np.ndarray) -> List[np.ndarray]:
+        """Split a label map into one 0/255 mask per color range."""
+        return [cv2.compare(labels & np.uint8(1 << index), 0, cv2.CMP_GT) for index in range(len(self.names))]
+
+    def segment(self, image: np.ndarray, scratch: Dict[str, np.ndarray] = None) -> List[np.ndarray]:
+        return self.masks(self.label(image, scratch))
+
+
+def _scratch_buffer(scratch: Dict[str, np.ndarray], key: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    buffer = scratch.get(key)
+    if buffer is None or buffer.shape != shape:
+        buffer = scratch[key] = np.empty(shape, dtype=dtype)
+    return buffer
+
+
+def _config_key(color_ranges: List[Dict[str, Any]]) -> str:
+    return json.dumps([[cr['name'], list(cr['lower']), list(cr['upper'])] for cr in color_ranges])
+
+
+@lru_cache(maxsize=8)
+def _cached_lut(key: str, bits: int) -> ColorLUT:
+    color_ranges = [{'name': name, 'lower': lower, 'upper': upper} for name, lower, upper in json.loads(key)]
+    return ColorLUT(color_ranges, bits)
+
+
+def get_color_lut(color_ranges: List[Dict[str, Any]], bits: int = 8) -> ColorLUT:
+    """ColorLUT for a color-range config, built once and cached per config."""
+    return _cached_lut(_config_key(color_ranges), bits)
+
+
+def clean_masks(masks: List[np.ndarray], kernel_size: int, blur_size: int) -> List[np.ndarray]:
+    """
+    Open, close and median-blur binary masks.
+
+    On a 0/255 mask the median of a window is a majority vote, so large median
+    blurs (where OpenCV has no fast path) are computed as an O(1) box count plus
+    threshold, which gives the same result as ``cv2.medianBlur``.
+    """
+    kernel = np.ones((kernel_size, kernel_size), np.uint8)
+    majority = (blur_size * blur_size) // 2 + 1
+    cleaned = []
+    for mask in masks:
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        if blur_size <= 5:
+            cleaned.append(cv2.medianBlur(mask, blur_size))
+            continue
+        votes = cv2.boxFilter(mask // 255, cv2.CV_16U, (blur_size, blur_size),
+                              normalize=False, borderType=cv2.BORDER_REPLICATE)
+        cleaned.append(cv2.compare(votes, majority - 1, cv2.CMP_GT))
+    return cleaned
+
+
+def cleanup_sizes(image_width: int, image_height: int) -> Tuple[int, int]:
+    """Morphology kernel and median blur size used for mask cleanup at a given resolution."""
+    kernel_size = max(3, min(15, int(min(image_width, image_height) * 0.01)))
+    blur_size = max(3, min(7, kernel_size // 2))
+    if blur_size % 2 == 0:
+        blur_size += 1
+    return kernel_size, blur_size
+
+
+def pyramid_downscale(image: np.ndarray, scale: float) -> np.ndarray:
+    """
+    Downscale an image to ``scale`` of its size.
+
+    Halvings are done with ``cv2.pyrDown`` (Gaussian smoothing plus decimation),
+    any remaining factor with an area resize.
+    """
+    if scale >= 1.0:
+        return image
+    height, width = image.shape[:2]
+    target = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    while image.shape[1] >= 2 * target[0] and image.shape[0] >= 2 * target[1]:
+        image = cv2.pyrDown(image)
+    if (image.shape[1], image.shape[0]) != target:
+        image = cv2.resize(image, target, interpolation=cv2.INTER_AREA)
+    return image
@@ -0,0 +1,451 @@
+"""
+Local detection worker service.
+
+A small HTTP server in front of a set of warm detection processes, so that
+detection runs outside the agent process: the agent's event loop stays free
+while a frame is analyzed, YOLO models and color tables are loaded once per
+worker rather than per observation, and detection scales over the cores
+independently of the agent.
+
+Endpoints:
+
+* ``POST /detect`` with an encoded image as the body (``Content-Type``
+  ``application/octet-stream`` or ``image/*``, options as query parameters,
+  values JSON-decoded where possible), or with a JSON body
+  ``{"image_path": ..., "options": {...}, "visualize": true}`` referring to a
+  frame under the service's ``--frames-dir``. Requests carry the service token
+  in the ``X-Detection-Token`` header. Only the detection options in
+  ``REQUEST_OPTIONS`` are accepted; file paths (templates, YOLO model,
+  calibration) are fixed when the service starts. Returns
+  ``{"analysis": ..., "visualization": <base64 JPEG or null>}``; the service
+  writes no files, the caller stores the results (see ``detect_remote``).
+* ``GET /health``
+
+A detection that misses the request timeout has its worker process killed and
+replaced, so it neither keeps the worker busy nor delivers a late result.
+
+Run it with::
+
+    python -m lego_robot_agent.detection.service --port 8765 --workers 2 --token <secret>
+
+and call it from asyncio code with ``detect_remote``.
+"""
+
+import argparse
+import asyncio
+import base64
+import hmac
+import json
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+DEFAULT_PORT = 8765
+TOKEN_HEADER = 'X-Detection-Token'
+MAX_BODY_SIZE = 64 * 1024 * 1024
+# The server gives up before the client does, so a worker is never held for an answer nobody reads
+DEFAULT_REQUEST_TIMEOUT = 20.0
+DEFAULT_CLIENT_TIMEOUT = 30.0
+
+# RoboProcessArgs attributes a request may set
+REQUEST_OPTIONS = (
+    'method',
+    'target_objects',
+    'confidence',
+    'pixels_per_unit',
+    'no_preprocessing',
+    'processing_scale',
+    'refine',
+    'component_analysis',
+    'yolo_backend',
+    'yolo_threads',
+    'camera_id',
+    'cache',
+    'cache_tolerance',
+    'method_timeouts',
+    'class_map',
+)
+
+
+def args_options(args) -> Dict[str, Any]:
+    """The request options of a RoboProcessArgs that differ from the defaults, for sending to the service."""
+    from ..models import RoboProcessArgs
+    defaults = vars(RoboProcessArgs())
+    return {name: getattr(args, name) for name in REQUEST_OPTIONS
+            if hasattr(args, name) and getattr(args, name) != defaults.get(name)}
+
+
+def _warm_worker(yolo_model: Optional[str]):
+    """Load what the first detection would otherwise pay for."""
+    from .detector import create_sample_color_ranges
+    from .segmentation import get_color_lut
+    from .yolo_models import get_yolo_model
+
+    get_color_lut(create_sample_color_ranges())
+    if yolo_model:
+        try:
+            get_yolo_model(yolo_model)
+        except Exception as e:
+            print(f"Could not warm up YOLO model {yolo_model}: {e}")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _detect_in_worker(image_data: Optional[bytes], image_path: Optional[str], options: Dict[str, Any],
+                      visualize: bool) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    from ..models import RoboProcessArgs
+    from .artifacts import flush_artifacts
+    from .detector import run_detection
+
+    args = RoboProcessArgs()
+    for name, value in options.items():
+        setattr(args, name, value)
+    args.image_data = image_data
+    if image_path:
+        args.image_path = image_path
+    args.no_display = True
+    args.output = None
+    args.save_masks = None
+    args.artifacts = 'results' if visualize else 'none'
+    args.visualize = None
+
+    # The visualization goes back in the response; the file is private to this request
+    if visualize:
+        handle, args.visualize = tempfile.mkstemp(prefix='detection_', suffix='.jpg')
+        os.close(handle)
+    try:
+        analysis = run_detection(args)
+        visualization = None
+        if visualize:
+            flush_artifacts()
+            with open(args.visualize, 'rb') as f:
+                # Empty when nothing was detected
+                visualization = f.read() or None
+    finally:
+        if visualize:
+            os.unlink(args.visualize)
+    return analysis, visualization
+
+
+class _Worker:
+    """One warm detection process."""
+
+    def __init__(self, yolo_model: Optional[str]):
+        # spawn: forked children would inherit OpenCV's thread pools in an undefined state
+        self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_warm_worker, initargs=(yolo_model,))
+        # Start and warm the process now rather than on the first request
+        self.pid = self.executor.submit(_ping).result()
+
+    def run(self, timeout: Optional[float], *args):
+        return self.executor.submit(_detect_in_worker, *args).result(timeout)
+
+    def kill(self):
+        try:
+            os.kill(self.pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        except OSError:
+            pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class DetectionService:
+    """
+    Warm detection worker processes, one detection at a time each.
+
+    ``templates``, ``yolo_model`` and ``calibration`` apply to every request.
+    """
+
+    def __init__(self, workers: int = None, yolo_model: str = None, templates: list = None,
+                 calibration: str = None):
+        self.workers = workers or os.cpu_count() or 2
+        self.yolo_model = yolo_model
+        self.settings = {name: value for name, value in
+                         (('yolo_model', yolo_model), ('templates', templates), ('calibration', calibration)) if value}
+        self.lock = threading.Lock()
+        self.closed = False
+        self.running = set()
+        self.idle: "queue.Queue[_Worker]" = queue.Queue()
+        for _ in range(self.workers):
+            self._add_worker()
+
+    def _add_worker(self):
+        try:
+            worker = _Worker(self.yolo_model)
+        except Exception as e:
+            print(f"Could not start a detection worker: {e}")
+            return
+        with self.lock:
+            if self.closed:
+                worker.kill()
+                return
+            self.running.add(worker)
+        self.idle.put(worker)
+
+    def _discard_worker(self, worker: _Worker):
+        worker.kill()
+        with self.lock:
+            self.running.discard(worker)
+            if self.closed:
+                return
+        # Started in the background so the failed request is answered right away
+        threading.Thread(target=self._add_worker, daemon=True).start()
+
+    def detect(self, image_data: Optional[bytes], image_path: Optional[str], options: Dict[str, Any],
+               visualize: bool = False, timeout: float = DEFAULT_REQUEST_TIMEOUT) -> Tuple[Dict[str, Any], Optional[bytes]]:
+        """
+        Detect on a free worker; returns the analysis and the encoded visualization.
+
+        Raises ``concurrent.futures.TimeoutError`` if no worker is free or the
+        detection does not finish within ``timeout`` seconds (None means
+        ``DEFAULT_REQUEST_TIMEOUT``, waits are never unbounded). A timed-out or
+        crashed worker is replaced.
+        """
+        timeout = DEFAULT_REQUEST_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        try:
+            worker = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No detection worker became free")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # Not started, so the worker is still good
+            self.idle.put(worker)
+            raise TimeoutError("No detection worker became free in time")
+        try:
+            return worker.run(remaining, image_data, image_path, {**self.settings, **options}, visualize)
+        except (TimeoutError, BrokenProcessPool):
+            # A timed-out job would keep running and hold the worker; kill it with the process
+            self._discard_worker(worker)
+            worker = None
+            raise
+        finally:
+            if worker is not None:
+                self.idle.put(worker)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            workers = list(self.running)
+            self.running.clear()
+        for worker in workers:
+            worker.kill()
+
+
+def _parse_value(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        self._send_json(200, {'status': 'ok', 'workers': self.server.service.workers})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/detect':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        if not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ''), self.server.token):
+            self._send_json(401, {'error': f'Missing or wrong {TOKEN_HEADER}'})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        if length > MAX_BODY_SIZE:
+            self._send_json(413, {'error': 'Request body too large'})
+            return
+        body = self.rfile.read(length)
+        if len(body) < length:
+            # The client went away while sending; nobody would read the result
+            return
+
+        content_type = self.headers.get('Content-Type', '')
+        image_data = image_path = None
+        if content_type.startswith('application/json'):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self._send_json(400, {'error': 'Invalid JSON body'})
+                return
+            image_path = payload.get('image_path')
+            options = payload.get('options') or {}
+            visualize = bool(payload.get('visualize', False))
+        elif content_type.startswith(('application/octet-stream', 'image/')):
+            image_data = body
+            options = {name: _parse_value(values[-1]) for name, values in parse_qs(url.query).items()}
+            visualize = bool(options.pop('visualize', False))
+        else:
+            self._send_json(415, {'error': 'Send an image body or a JSON request'})
+            return
+
+        if not image_data and not image_path:
+            self._send_json(400, {'error': 'An image body or image_path is required'})
+            return
+        if image_path:
+            image_path = self._frame_path(image_path)
+            if image_path is None:
+                self._send_json(403, {'error': 'image_path must be a file under the frames directory'})
+                return
+        unknown = set(options) - set(REQUEST_OPTIONS)
+        if unknown:
+            self._send_json(400, {'error': f"Unknown options: {', '.join(sorted(unknown))}"})
+            return
+
+        started = time.perf_counter()
+        try:
+            analysis, visualization = self.server.service.detect(image_data, image_path, options, visualize,
+                                                                 self.server.request_timeout)
+        except TimeoutError:
+            self._send_json(504, {'error': 'Detection timed out'})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': f"Detection failed: {e}"})
+            return
+        response = {
+            'analysis': analysis,
+            'visualization': base64.b64encode(visualization).decode('ascii') if visualization else None,
+        }
+        self._send_json(200, response, {'X-Elapsed-Ms': f"{(time.perf_counter() - started) * 1000:.1f}"})
+
+    def _frame_path(self, image_path: str) -> Optional[str]:
+        """The real path of a frame reference, or None unless it lies under the frames directory."""
+        frames_dir = self.server.frames_dir
+        if frames_dir is None:
+            return None
+        path = os.path.realpath(os.path.join(frames_dir, image_path))
+        try:
+            inside = os.path.commonpath([path, frames_dir]) == frames_dir
+        except ValueError:
+            # Different drives on Windows
+            inside = False
+        return path if inside and os.path.isfile(path) else None
+
+    def _send_json(self, status: int, data: Dict[str, Any], headers: Dict[str, str] = None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and went on without this result
+            pass
+
+
+def create_server(service: DetectionService, token: str, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                  frames_dir: str = None, request_timeout: float = DEFAULT_REQUEST_TIMEOUT) -> ThreadingHTTPServer:
+    """
+    HTTP front end of ``service``. ``frames_dir`` enables frame references
+    (``image_path``) to files below it; without it only image bodies are accepted.
+    Keep ``request_timeout`` below the clients' timeout.
+    """
+    if not token:
+        raise ValueError("The detection service requires a token")
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.service = service
+    server.token = token
+    server.frames_dir = os.path.realpath(frames_dir) if frames_dir else None
+    server.request_timeout = request_timeout
+    return server
+
+
+def _store_results(analysis: Dict[str, Any], visualization: Optional[str], output: Optional[str],
+                   visualize: Optional[str]):
+    if output:
+        with open(output, 'w') as f:
+            f.write(json.dumps(analysis, indent=2))
+    if visualize and visualization:
+        with open(visualize, 'wb') as f:
+            f.write(base64.b64decode(visualization))
+
+
+async def detect_remote(url: str, image_data: bytes = None, image_path: str = None,
+                        options: Dict[str, Any] = None, token: str = None, output: str = None,
+                        visualize: str = None, timeout: float = DEFAULT_CLIENT_TIMEOUT) -> Dict[str, Any]:
+    """
+    Run a detection on the service at ``url`` without blocking the event loop.
+
+    Sends the encoded frame if given, else ``image_path`` relative to the
+    service's frames directory. The analysis JSON and the visualization are
+    written to ``output`` and ``visualize`` here, only once a response arrived
+    in time. Raises ``asyncio.TimeoutError`` after ``timeout`` seconds and
+    ``requests.RequestException`` if the service fails.
+    """
+    endpoint = url.rstrip('/') + '/detect'
+    headers = {TOKEN_HEADER: token or ''}
+    if image_data is not None:
+        params = {name: json.dumps(value) for name, value in (options or {}).items()}
+        if visualize:
+            params['visualize'] = 'true'
+        headers['Content-Type'] = 'application/octet-stream'
+        request = lambda: requests.post(endpoint, data=image_data, params=params, headers=headers, timeout=timeout)
+    else:
+        payload = {'image_path': image_path, 'options': options or {}, 'visualize': bool(visualize)}
+        request = lambda: requests.post(endpoint, json=payload, headers=headers, timeout=timeout)
+
+    response = await asyncio.wait_for(asyncio.to_thread(request), timeout)
+    response.raise_for_status()
+    result = response.json()
+    await asyncio.to_thread(_store_results, result['analysis'], result.get('visualization'), output, visualize)
+    return result['analysis']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local detection worker service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--token', default=os.environ.get('LEGO_DETECTION_TOKEN'),
+                        help='token clients send in the X-Detection-Token header (default: $LEGO_DETECTION_TOKEN, '
+                             'else a random one is printed)')
+    parser.add_argument('--frames-dir', default=None, help='directory that image_path references may point into')
+    parser.add_argument('--yolo-model', default=None, help='YOLO model for every request, loaded at startup')
+    parser.add_argument('--templates', nargs='+', default=None, help='template images for the template method')
+    parser.add_argument('--calibration', default=None, help='lego-cam calibration file for the field ROI')
+    parser.add_argument('--request-timeout', type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                        help='seconds per detection, including the wait for a free worker; keep it below the '
+                             f'clients\' timeout (LEGO_DETECTION_TIMEOUT, default {DEFAULT_CLIENT_TIMEOUT:g})')
+    args = parser.parse_args()
+
+    token = args.token
+    if not token:
+        token = secrets.token_urlsafe(24)
+        print(f"Detection service token: {token}")
+
+    service = DetectionService(args.workers, args.yolo_model, args.templates, args.calibration)
+    server = create_server(service, token, args.host, args.port, args.frames_dir, args.request_timeout)
+    print(f"Detection service with {service.workers} workers on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
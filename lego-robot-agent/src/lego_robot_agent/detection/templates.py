@@ -0,0 +1,167 @@
+"""
+Cached, pyramid-accelerated template matching.
+
+Templates are read from disk once per process (and again only if the file
+changes) and their scaled and downsampled variants are kept with them. Each
+search runs ``matchTemplate`` on a coarse pyramid level first, refines the
+best coarse peaks at full resolution in small windows, and reduces the
+surviving matches with non-maximum suppression, so one object yields one
+detection instead of every pixel above the threshold.
+"""
+
+import os
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Smallest template side kept at a coarse level; smaller templates match poorly
+MIN_COARSE_SIZE = 12
+# Coarse scores are lower than full-resolution ones, so coarse peaks are taken this much below the threshold
+COARSE_SLACK = 0.15
+
+
+class TemplateEntry:
+    """A grayscale template with lazily built (scale, level) variants."""
+
+    def __init__(self, path: str, image: np.ndarray):
+        self.path = path
+        self.image = image
+        self.variants: Dict[Tuple[float, int], np.ndarray] = {}
+        self.lock = threading.Lock()
+
+    def variant(self, scale: float, level: int) -> np.ndarray:
+        key = (scale, level)
+        with self.lock:
+            template = self.variants.get(key)
+            if template is None:
+                template = self.image
+                if scale != 1.0:
+                    size = (max(1, int(round(template.shape[1] * scale))), max(1, int(round(template.shape[0] * scale))))
+                    template = cv2.resize(template, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+                for _ in range(level):
+                    template = cv2.pyrDown(template)
+                self.variants[key] = template
+            return template
+
+
+_cache: Dict[str, Tuple[float, TemplateEntry]] = {}
+_cache_lock = threading.Lock()
+
+
+def load_template(path: str) -> TemplateEntry:
+    """Grayscale template for a path, read once and cached until the file changes."""
+    mtime = os.path.getmtime(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Could not read template {path}")
+    entry = TemplateEntry(path, image)
+    with _cache_lock:
+        _cache[path] = (mtime, entry)
+    return entry
+
+
+def clear_template_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def coarse_level(template_width: int, template_height: int, max_level: int = 3) -> int:
+    """Deepest pyramid level at which the template keeps at least MIN_COARSE_SIZE pixels per side."""
+    level = 0
+    while level < max_level and min(template_width, template_height) >> (level + 1) >= MIN_COARSE_SIZE:
+        level += 1
+    return level
+
+
+def build_pyramid(gray: np.ndarray, levels: int) -> List[np.ndarray]:
+    pyramid = [gray]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+def _peaks(scores: np.ndarray, threshold: float, max_peaks: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(x, y) of the strongest local maxima at or above threshold."""
+    local_max = cv2.dilate(scores, np.ones((3, 3), np.uint8))
+    ys, xs = np.nonzero((scores >= threshold) & (scores >= local_max))
+    if len(xs) > max_peaks:
+        strongest = np.argpartition(-scores[ys, xs], max_peaks - 1)[:max_peaks]
+        xs, ys = xs[strongest], ys[strongest]
+    return xs, ys
+
+
+def match_template(pyramid: List[np.ndarray], entry: TemplateEntry, threshold: float,
+                   scales: Sequence[float] = (1.0,), max_peaks: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matches of one template in an image pyramid (level 0 = full resolution).
+
+    Returns boxes (N, 4) as x, y, w, h in full-resolution pixels and their
+    full-resolution scores, before non-maximum suppression.
+    """
+    gray = pyramid[0]
+    boxes, scores = [], []
+
+    for scale in scales:
+        template = entry.variant(scale, 0)
+        height, width = template.shape[:2]
+        if width > gray.shape[1] or height > gray.shape[0]:
+            continue
+
+        level = min(coarse_level(width, height), len(pyramid) - 1)
+        if level == 0:
+            result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+            xs, ys = _peaks(result, threshold, max_peaks)
+            boxes.extend((x, y, width, height) for x, y in zip(xs.tolist(), ys.tolist()))
+            scores.extend(result[ys, xs].tolist())
+            continue
+
+        coarse = cv2.matchTemplate(pyramid[level], entry.variant(scale, level), cv2.TM_CCOEFF_NORMED)
+        xs, ys = _peaks(coarse, threshold - COARSE_SLACK, max_peaks)
+
+        # Refine each coarse peak at full resolution within one coarse pixel plus a margin
+        factor = 1 << level
+        pad = factor + 2
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            x0, y0 = max(0, x * factor - pad), max(0, y * factor - pad)
+            x1 = min(gray.shape[1] - width, x * factor + pad)
+            y1 = min(gray.shape[0] - height, y * factor + pad)
+            if x1 < x0 or y1 < y0:
+                continue
+            window = gray[y0:y1 + height, x0:x1 + width]
+            _, score, _, (dx, dy) = cv2.minMaxLoc(cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED))
+            if score >= threshold:
+                boxes.append((x0 + dx, y0 + dy, width, height))
+                scores.append(score)
+
+    return np.array(boxes, dtype=np.int32).reshape(-1, 4), np.array(scores, dtype=np.float32)
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.3) -> np.ndarray:
+    """Indices of the boxes (x, y, w, h) kept by greedy NMS, best score first."""
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.intp)
+
+    x1 = boxes[:, 0].astype(np.float64)
+    y1 = boxes[:, 1].astype(np.float64)
+    x2 = x1 + boxes[:, 2]
+    y2 = y1 + boxes[:, 3]
+    areas = boxes[:, 2].astype(np.float64) * boxes[:, 3]
+
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while len(order):
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        iw = np.maximum(0.0, np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]))
+        ih = np.maximum(0.0, np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]))
+        inter = iw * ih
+        iou = inter / (areas[best] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
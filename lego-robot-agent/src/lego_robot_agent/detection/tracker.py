@@ -0,0 +1,167 @@
+"""
+Incremental object tracking between observations.
+
+After one full-frame color detection every object is searched only in a window
+around where it is expected next: its last position, moved by the motion the
+robot was commanded to make or, without a command, by its measured velocity
+(which already reflects earlier commanded moves). A full detection
+is run again when an object is lost, when a match looks unreliable (its area
+changed too much), and every ``full_every`` updates to pick up new objects.
+The last ``history_size`` frames are kept as DetectionResults in ``history``.
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .detector import ObjectDetector
+from .result import DetectionResult
+
+
+class Track:
+    """State of one tracked object."""
+
+    def __init__(self, track_id: int, obj: Dict[str, Any], box: Tuple[int, int, int, int], timestamp: float):
+        self.track_id = track_id
+        self.name = obj['name']
+        self.obj = obj
+        self.box = box
+        self.timestamp = timestamp
+        self.velocity = (0.0, 0.0)
+
+    def update(self, obj: Dict[str, Any], box: Tuple[int, int, int, int], timestamp: float):
+        dt = timestamp - self.timestamp
+        if dt > 0:
+            (old_x, old_y), (new_x, new_y) = self.obj['center'], obj['center']
+            self.velocity = ((new_x - old_x) / dt, (new_y - old_y) / dt)
+        self.obj = obj
+        self.box = box
+        self.timestamp = timestamp
+
+    def search_window(self, timestamp: float, motion: Optional[Tuple[float, float]],
+                      margin: int) -> Tuple[int, int, int, int]:
+        """
+        Predicted (x0, y0, x1, y1) to search in, padded by margin and half the object size.
+
+        A commanded ``motion`` replaces the velocity prediction rather than adding
+        to it, since the velocity was measured over earlier commanded moves.
+        """
+        x, y, w, h = self.box
+        if motion is not None:
+            dx, dy = motion
+        else:
+            dt = timestamp - self.timestamp
+            dx, dy = self.velocity[0] * dt, self.velocity[1] * dt
+        pad = margin + max(w, h) // 2
+        return (int(x + dx - pad), int(y + dy - pad), int(x + w + dx + pad), int(y + h + dy + pad))
+
+
+class ObjectTracker:
+    """
+    Track color-detected objects across frames.
+
+    ``update`` returns the same object dicts as ``detect_objects_by_color``
+    with ``track_id``, ``velocity`` (pixels per second in image coordinates)
+    and ``tracking`` ('full' or 'window') added.
+    """
+
+    def __init__(self, color_ranges: List[Dict[str, Any]], detector: ObjectDetector = None,
+                 margin: int = 40, min_area_ratio: float = 0.5, full_every: int = 10,
+                 use_preprocessing: bool = True, processing_scale: float = 1.0, history_size: int = 100):
+        self.color_ranges = color_ranges
+        self.ranges_by_name = {color_range['name']: color_range for color_range in color_ranges}
+        self.detector = detector or ObjectDetector()
+        self.margin = margin
+        self.min_area_ratio = min_area_ratio
+        self.full_every = full_every
+        self.use_preprocessing = use_preprocessing
+        self.processing_scale = processing_scale
+
+        self.tracks: Dict[str, Track] = {}
+        self.next_id = 1
+        self.updates_since_full = 0
+        # Tracked objects per frame, oldest first, with track ids and timestamps
+        self.history: Deque[DetectionResult] = deque(maxlen=history_size)
+
+    def reset(self):
+        self.tracks = {}
+        self.updates_since_full = 0
+        self.history.clear()
+
+    def update(self, image: np.ndarray, motion: Optional[Dict[str, Tuple[float, float]]] = None,
+               timestamp: float = None) -> List[Dict[str, Any]]:
+        """
+        Track objects into a new frame.
+
+        ``motion`` maps object names to the pixel displacement (dx, dy) expected
+        from commanded movement since the previous frame, e.g. {'robot': (0, -80)}.
+        """
+        if not self.detector.set_image(image):
+            return []
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        motion = motion or {}
+
+        objects = None
+        if self.tracks and (not self.full_every or self.updates_since_full < self.full_every):
+            objects = self._track_windows(timestamp, motion)
+
+        if objects is None:
+            objects = self._detect_full(timestamp)
+            self.updates_since_full = 0
+        else:
+            self.updates_since_full += 1
+
+        self.detector.detected_objects = objects
+        self.history.append(self.detector.get_detection_result(keep_contours=False, timestamp=timestamp))
+        return objects
+
+    def _track_windows(self, timestamp: float, motion: Dict[str, Tuple[float, float]]) -> Optional[List[Dict[str, Any]]]:
+        """Search every track in its window, or None if any of them needs a full detection."""
+        found = []
+        for name, track in self.tracks.items():
+            window = track.search_window(timestamp, motion.get(name), self.margin)
+            obj = self.detector.detect_color_in_box(self.ranges_by_name[name], window, self.use_preprocessing)
+            if obj is None:
+                return None
+
+            area_ratio = min(obj['area'], track.obj['area']) / max(obj['area'], track.obj['area'])
+            if area_ratio < self.min_area_ratio:
+                return None
+            found.append((track, obj))
+
+        objects = []
+        for track, obj in found:
+            track.update(obj, self._blob_box(obj), timestamp)
+            objects.append(self._annotate(track, 'window'))
+        return objects
+
+    def _detect_full(self, timestamp: float) -> List[Dict[str, Any]]:
+        """Full-frame detection; objects keep their track by name."""
+        detected = self.detector.detect_objects_by_color(
+            self.color_ranges, use_preprocessing=self.use_preprocessing,
+            processing_scale=self.processing_scale, refine=self.processing_scale < 1.0)
+
+        tracks = {}
+        for obj in detected:
+            track = self.tracks.get(obj['name'])
+            if track is None:
+                track = Track(self.next_id, obj, self._blob_box(obj), timestamp)
+                self.next_id += 1
+            else:
+                track.update(obj, self._blob_box(obj), timestamp)
+            tracks[obj['name']] = track
+        self.tracks = tracks
+
+        return [self._annotate(track, 'full') for track in tracks.values()]
+
+    def _blob_box(self, obj: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        return ObjectDetector.blob_box(obj, self.ranges_by_name[obj['name']])
+
+    def _annotate(self, track: Track, mode: str) -> Dict[str, Any]:
+        obj = dict(track.obj)
+        obj['track_id'] = track.track_id
+        obj['velocity'] = track.velocity
+        obj['tracking'] = mode
+        return obj
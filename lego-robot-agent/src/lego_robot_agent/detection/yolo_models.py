@@ -0,0 +1,188 @@
+"""
+Process-wide YOLO model registry.
+
+Every model is loaded once per process and warmed up with one inference on a
+blank frame, so neither the load nor the slow first inference lands on an
+observation. Two backends are supported:
+
+* ``ultralytics`` - a ``.pt`` model through the ultralytics package
+* ``onnx`` - a model exported with ``yolo export format=onnx``, run with
+  ONNX Runtime on the CPU with a configurable number of threads
+
+Both take a list of BGR frames and return, per frame, an (N, 6) array of
+``x1, y1, x2, y2, confidence, class_id`` in frame pixels.
+"""
+
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .templates import non_max_suppression
+
+# Optional backends
+try:
+    from ultralytics import YOLO
+    YOLO_AVAILABLE = True
+except ImportError:
+    YOLO_AVAILABLE = False
+
+try:
+    import onnxruntime
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+DEFAULT_MODEL = 'yolov8n.pt'
+# Square input side of the standard YOLOv8 exports
+DEFAULT_INPUT_SIZE = 640
+
+
+class UltralyticsBackend:
+
+    def __init__(self, model_path: str):
+        if not YOLO_AVAILABLE:
+            raise RuntimeError("YOLO detection requires the ultralytics package")
+        self.model = YOLO(model_path)
+        # ultralytics predictors keep per-call state and are not thread-safe
+        self.lock = threading.Lock()
+
+    def predict(self, frames: List[np.ndarray], confidence: float) -> List[np.ndarray]:
+        with self.lock:
+            results = self.model(frames, conf=confidence, verbose=False)
+
+        detections = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                detections.append(np.zeros((0, 6), dtype=np.float32))
+                continue
+            detections.append(np.hstack([
+                boxes.xyxy.cpu().numpy(),
+                boxes.conf.cpu().numpy()[:, None],
+                boxes.cls.cpu().numpy()[:, None],
+            ]).astype(np.float32))
+        return detections
+
+
+class OnnxBackend:
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None, iou_threshold: float = 0.45):
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("ONNX YOLO detection requires the onnxruntime package")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads or 0
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                    providers=['CPUExecutionProvider'])
+        self.iou_threshold = iou_threshold
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        self.input_size = (width if isinstance(width, int) else DEFAULT_INPUT_SIZE,
+                           height if isinstance(height, int) else DEFAULT_INPUT_SIZE)
+        # Exports without dynamic=True have a fixed batch of 1
+        self.max_batch = batch if isinstance(batch, int) else None
+
+    def _letterbox(self, frame: np.ndarray) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+        """Resize keeping the aspect ratio and pad to the model input, as ultralytics does."""
+        input_width, input_height = self.input_size
+        height, width = frame.shape[:2]
+        ratio = min(input_width / width, input_height / height)
+        resized_width, resized_height = int(round(width * ratio)), int(round(height * ratio))
+        pad_x, pad_y = (input_width - resized_width) // 2, (input_height - resized_height) // 2
+
+        canvas = np.full((input_height, input_width, 3), 114, dtype=np.uint8)
+        canvas[pad_y:pad_y + resized_height, pad_x:pad_x + resized_width] = cv2.resize(
+            frame, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR)
+        return canvas, ratio, (pad_x, pad_y)
+
+    def predict(self, frames: List[np.ndarray], confidence: float) -> List[np.ndarray]:
+        prepared = [self._letterbox(frame) for frame in frames]
+        # BGR HWC uint8 -> RGB CHW float in [0, 1]
+        blobs = cv2.dnn.blobFromImages([canvas for canvas, _, _ in prepared], 1 / 255.0, swapRB=True)
+
+        step = self.max_batch or len(frames)
+        outputs = []
+        for start in range(0, len(frames), step):
+            outputs.append(self.session.run(None, {self.input_name: blobs[start:start + step]})[0])
+        output = np.concatenate(outputs)
+
+        return [self._postprocess(prediction, ratio, padding, confidence)
+                for prediction, (_, ratio, padding) in zip(output, prepared)]
+
+    def _postprocess(self, prediction: np.ndarray, ratio: float, padding: Tuple[int, int],
+                     confidence: float) -> np.ndarray:
+        # YOLOv8 exports (4 + classes, anchors); accept the transposed layout too
+        if prediction.shape[0] < prediction.shape[1]:
+            prediction = prediction.T
+        scores = prediction[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        class_scores = scores[np.arange(len(scores)), class_ids]
+
+        keep = class_scores >= confidence
+        boxes, class_ids, class_scores = prediction[keep, :4], class_ids[keep], class_scores[keep]
+        if not len(boxes):
+            return np.zeros((0, 6), dtype=np.float32)
+
+        # Center/size in letterboxed pixels -> corners in frame pixels
+        x1 = (boxes[:, 0] - boxes[:, 2] / 2 - padding[0]) / ratio
+        y1 = (boxes[:, 1] - boxes[:, 3] / 2 - padding[1]) / ratio
+        x2 = (boxes[:, 0] + boxes[:, 2] / 2 - padding[0]) / ratio
+        y2 = (boxes[:, 1] + boxes[:, 3] / 2 - padding[1]) / ratio
+
+        # Per-class NMS by shifting each class into its own coordinate range
+        shift = class_ids * 10000.0
+        xywh = np.stack([x1 + shift, y1, x2 - x1, y2 - y1], axis=1)
+        kept = non_max_suppression(xywh, class_scores, self.iou_threshold)
+
+        return np.stack([x1, y1, x2, y2, class_scores, class_ids.astype(np.float32)], axis=1)[kept].astype(np.float32)
+
+
+_models: Dict[Tuple[str, str, Optional[int]], object] = {}
+_models_lock = threading.Lock()
+
+
+def resolve_backend(model_path: str, backend: str = 'auto') -> str:
+    if backend != 'auto':
+        return backend
+    return 'onnx' if os.path.splitext(model_path)[1].lower() == '.onnx' else 'ultralytics'
+
+
+def get_yolo_model(model_path: str = DEFAULT_MODEL, backend: str = 'auto', num_threads: Optional[int] = None,
+                   warmup: bool = True):
+    """
+    Shared model for a path and backend, loaded and warmed up on first use.
+
+    ``backend`` is 'ultralytics', 'onnx' or 'auto' (by file extension);
+    ``num_threads`` sets the ONNX Runtime intra-op threads (default: all cores).
+    """
+    backend = resolve_backend(model_path, backend)
+    key = (model_path, backend, num_threads if backend == 'onnx' else None)
+
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        if backend == 'onnx':
+            model = OnnxBackend(model_path, num_threads)
+        elif backend == 'ultralytics':
+            model = UltralyticsBackend(model_path)
+        else:
+            raise ValueError(f"Unknown YOLO backend: {backend}")
+
+        if warmup:
+            model.predict([np.zeros((DEFAULT_INPUT_SIZE, DEFAULT_INPUT_SIZE, 3), dtype=np.uint8)], 0.5)
+
+        _models[key] = model
+        return model
+
+
+def clear_yolo_models():
+    with _models_lock:
+        _models.clear()
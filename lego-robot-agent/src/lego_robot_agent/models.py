@@ -49,6 +49,7 @@ class RoboProcessArgs:
     
     def __init__(self):
         self.image_path = "image_input.jpg"
+        self.image_data = None
         self.method = "color"
         self.templates = None
         self.target_objects = ["blue", "red"]
@@ -58,6 +59,21 @@ class RoboProcessArgs:
         self.pixels_per_unit = 1.0
         self.no_display = False
         self.no_preprocessing = False
+        self.processing_scale = 1.0
+        self.refine = False
+        self.component_analysis = False
+        self.yolo_model = "yolov8n.pt"
+        self.yolo_backend = "auto"
+        self.yolo_threads = None
+        self.calibration = None
+        self.camera_id = "default"
+        self.artifacts = "results"
+        self.save_masks = None
+        self.cache = False
+        self.cache_tolerance = None
+        self.profile = False
+        self.method_timeouts = None
+        self.class_map = None
 
 
 @dataclass
@@ -31,6 +31,11 @@ azure_client = AzureOpenAIChatClient(
 # Get Azure AI Foundry project endpoint from environment
 AZURE_AI_PROJECT_ENDPOINT = os.environ.get("AZURE_AI_PROJECT_ENDPOINT", os.environ.get("PROJECT_CONNECTION_STRING", ""))
 
+# Local detection service (python -m lego_robot_agent.detection.service); empty runs detection in-process
+DETECTION_SERVICE_URL = os.environ.get("LEGO_DETECTION_SERVICE", "")
+DETECTION_SERVICE_TIMEOUT = float(os.environ.get("LEGO_DETECTION_TIMEOUT", "30"))
+DETECTION_SERVICE_TOKEN = os.environ.get("LEGO_DETECTION_TOKEN", "")
+
 project_client = AIProjectClient(
     endpoint=AZURE_AI_PROJECT_ENDPOINT,
     credential=DefaultAzureCredential(),
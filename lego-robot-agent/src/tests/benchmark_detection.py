@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Per-stage detection benchmark on the bundled test images.
+
+Every method (color, template, yolo) runs on every image in testdata/ and
+sample/ with a StageProfiler attached. The script reports p50/p95 per stage
+(load, preprocessing, segmentation, morphology, contour search, analysis,
+visualization, ...) and per method, and compares them with a stored baseline:
+a stage whose p50 or p95 grew by more than ``--tolerance`` (and by more than
+``--min-delta-ms``) is a regression and makes the script exit with status 1.
+
+Timings depend on the machine, so no baseline is committed. Create one with
+``--save-baseline`` on the machine that runs the check (e.g. as the first CI
+step on a fixed runner). Without a baseline for every benchmarked method the
+regression check is skipped and the script exits with status 2, so a run
+that checked nothing is not mistaken for a passing one.
+
+Templates for the template method are cut from sample/step1.jpg around the
+objects the color detector finds there. YOLO is skipped if its model cannot
+be loaded.
+
+Usage:
+    python benchmark_detection.py --save-baseline
+    python benchmark_detection.py
+    python benchmark_detection.py --methods color template --repeat 5 --tolerance 0.2
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lego_robot_agent.detection import ObjectDetector, StageProfiler, create_sample_color_ranges, get_yolo_model
+from lego_robot_agent.detection.yolo_models import DEFAULT_MODEL
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+METHODS = ['color', 'template', 'yolo']
+
+# Exit statuses
+REGRESSION = 1
+NO_BASELINE = 2
+
+
+def find_images():
+    """Test images from testdata/ and sample/ at the repository root."""
+    patterns = ['testdata/*.jpg', 'testdata/raw/*.jpg', 'testdata/step/*.jpg', 'sample/*.jpg']
+    images = []
+    for pattern in patterns:
+        images.extend(sorted(glob.glob(os.path.join(REPO_ROOT, pattern))))
+    return images
+
+
+def make_templates(directory):
+    """Template files cut from sample/step1.jpg at the color detections."""
+    detector = ObjectDetector()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not detector.load_image(os.path.join(REPO_ROOT, 'sample', 'step1.jpg')):
+            return []
+        objects = detector.detect_objects_by_color(create_sample_color_ranges())
+
+    paths = []
+    for obj in objects:
+        x, y, w, h = obj['bounding_box']
+        if w > 100 or h > 100:
+            continue
+        path = os.path.join(directory, f"{obj['name']}.png")
+        cv2.imwrite(path, detector.image[y:y + h, x:x + w])
+        paths.append(path)
+    return paths
+
+
+def run_method(detector, method, options):
+    if method == 'color':
+        detector.detect_objects_by_color(create_sample_color_ranges())
+    elif method == 'template':
+        detector.detect_objects_by_template(options['templates'])
+    else:
+        detector.detect_objects_by_yolo(model_path=options['yolo_model'])
+
+
+def profile_once(path, method, options):
+    """Stage timings in milliseconds for one detection of one image."""
+    detector = ObjectDetector()
+    profiler = detector.profiler = StageProfiler()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with profiler.stage('load'):
+            loaded = detector.load_image(path)
+        if not loaded:
+            return None
+        run_method(detector, method, options)
+        with profiler.stage('analysis'):
+            detector.get_object_analysis()
+        if detector.detected_objects:
+            with profiler.stage('visualization'):
+                detector.visualize_results(None, False)
+
+    timings = profiler.milliseconds()
+    timings['total'] = sum(timings.values())
+    return timings
+
+
+def summarize(samples):
+    """p50/p95 per stage from a list of per-run timing dicts."""
+    stages = {}
+    for timings in samples:
+        for stage, ms in timings.items():
+            stages.setdefault(stage, []).append(ms)
+    return {stage: {'p50': float(np.percentile(values, 50)), 'p95': float(np.percentile(values, 95)),
+                    'runs': len(values)}
+            for stage, values in stages.items()}
+
+
+def print_summary(method, summary, baseline):
+    print(f"\n--- {method} ---")
+    print(f"{'stage':<16} {'p50 ms':>9} {'p95 ms':>9} {'base p50':>9} {'base p95':>9}")
+    for stage, stats in summary.items():
+        base = baseline.get(stage)
+        base_p50 = f"{base['p50']:>9.2f}" if base else f"{'-':>9}"
+        base_p95 = f"{base['p95']:>9.2f}" if base else f"{'-':>9}"
+        print(f"{stage:<16} {stats['p50']:>9.2f} {stats['p95']:>9.2f} {base_p50} {base_p95}")
+
+
+def regressions(method, summary, baseline, tolerance, min_delta_ms):
+    found = []
+    for stage, stats in summary.items():
+        base = baseline.get(stage)
+        if not base:
+            continue
+        for key in ('p50', 'p95'):
+            current, previous = stats[key], base[key]
+            if current > previous * (1 + tolerance) and current - previous > min_delta_ms:
+                found.append(f"{method}/{stage} {key}: {current:.2f} ms vs baseline {previous:.2f} ms "
+                             f"(+{(current / previous - 1) * 100 if previous else float('inf'):.0f}%)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage detection timings with regression check against a baseline')
+    parser.add_argument('--methods', nargs='+', choices=METHODS, default=METHODS)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per image (after one warm-up run)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown per stage')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='ignore slowdowns smaller than this')
+    parser.add_argument('--yolo-model', default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    images = find_images()
+    if not images:
+        print(f"No test images found under {REPO_ROOT}")
+        return 1
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    template_dir = tempfile.mkdtemp(prefix='benchmark_templates_')
+    options = {'templates': make_templates(template_dir), 'yolo_model': args.yolo_model}
+
+    methods = list(args.methods)
+    if 'template' in methods and not options['templates']:
+        print("Skipping template: no templates could be cut from sample/step1.jpg")
+        methods.remove('template')
+    if 'yolo' in methods:
+        try:
+            get_yolo_model(args.yolo_model)
+        except Exception as e:
+            print(f"Skipping yolo: {e}")
+            methods.remove('yolo')
+
+    print(f"\n=== Detection stage benchmark ({len(images)} images, {args.repeat} runs each) ===")
+    results = {}
+    failures = []
+    for method in methods:
+        samples = []
+        started = time.perf_counter()
+        for path in images:
+            profile_once(path, method, options)
+            for _ in range(args.repeat):
+                timings = profile_once(path, method, options)
+                if timings is not None:
+                    samples.append(timings)
+        results[method] = summarize(samples)
+        print_summary(method, results[method], baseline.get(method, {}))
+        print(f"({time.perf_counter() - started:.1f} s)")
+        failures += regressions(method, results[method], baseline.get(method, {}), args.tolerance, args.min_delta_ms)
+    unchecked = [method for method in methods if not baseline.get(method)]
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if failures:
+        print(f"\n{len(failures)} regression(s) against {args.baseline}:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return REGRESSION
+
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}, regression check skipped; "
+              f"run with --save-baseline on this machine first")
+        return NO_BASELINE
+    if unchecked:
+        print(f"\nNo baseline for {', '.join(unchecked)} in {args.baseline}, regression check skipped for "
+              f"{'it' if len(unchecked) == 1 else 'them'}; run with --save-baseline to add")
+        return NO_BASELINE
+
+    print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the color detector's processing scale on the bundled test images.
+
+For every scale the script reports the mean detection time and how far the
+detections move compared to full-resolution processing (center error in
+pixels, bounding box IoU, and objects missed or added).
+
+Usage:
+    python benchmark_processing_scale.py
+    python benchmark_processing_scale.py --scales 1 0.5 0.25 --refine --repeat 5
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lego_robot_agent.detection import ObjectDetector, create_sample_color_ranges
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def find_images():
+    """Test images from testdata/ and sample/ at the repository root."""
+    patterns = ['testdata/*.jpg', 'testdata/raw/*.jpg', 'testdata/step/*.jpg', 'sample/*.jpg']
+    images = []
+    for pattern in patterns:
+        images.extend(sorted(glob.glob(os.path.join(REPO_ROOT, pattern))))
+    return images
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = iw * ih
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def detect(detector, scale, refine, repeat):
+    color_ranges = create_sample_color_ranges()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        objects = detector.detect_objects_by_color(color_ranges, processing_scale=scale, refine=refine)
+    elapsed = (time.perf_counter() - started) / repeat
+    return {obj['name']: obj for obj in objects}, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Speed/accuracy trade-off of the color detection processing scale')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.5, 0.25])
+    parser.add_argument('--refine', action='store_true', help='also measure each scale with full-resolution refinement')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    images = find_images()
+    if not images:
+        print(f"No test images found under {REPO_ROOT}")
+        return 1
+
+    variants = [(scale, False) for scale in args.scales]
+    if args.refine:
+        variants += [(scale, True) for scale in args.scales if scale < 1.0]
+
+    totals = {variant: {'time': 0.0, 'center_error': [], 'iou': [], 'missed': 0, 'added': 0} for variant in variants}
+
+    for path in images:
+        detector = ObjectDetector()
+        if not detector.load_image(path):
+            continue
+
+        reference, _ = detect(detector, 1.0, False, 1)
+        for variant in variants:
+            found, elapsed = detect(detector, variant[0], variant[1], args.repeat)
+            stats = totals[variant]
+            stats['time'] += elapsed
+            stats['missed'] += len(reference.keys() - found.keys())
+            stats['added'] += len(found.keys() - reference.keys())
+            for name in reference.keys() & found.keys():
+                (rx, ry), (fx, fy) = reference[name]['center'], found[name]['center']
+                stats['center_error'].append(((rx - fx) ** 2 + (ry - fy) ** 2) ** 0.5)
+                stats['iou'].append(box_iou(reference[name]['bounding_box'], found[name]['bounding_box']))
+
+    print(f"\n=== Processing scale benchmark ({len(images)} images, {args.repeat} runs each) ===\n")
+    print(f"{'scale':>6} {'refine':>6} {'ms/image':>9} {'speedup':>8} {'center err px':>14} {'bbox IoU':>9} {'missed':>7} {'added':>6}")
+    base_time = totals[variants[0]]['time']
+    for variant in variants:
+        stats = totals[variant]
+        ms = stats['time'] / len(images) * 1000
+        error = sum(stats['center_error']) / len(stats['center_error']) if stats['center_error'] else 0.0
+        iou = sum(stats['iou']) / len(stats['iou']) if stats['iou'] else 0.0
+        speedup = base_time / stats['time'] if stats['time'] else 0.0
+        print(f"{variant[0]:>6.2f} {'yes' if variant[1] else 'no':>6} {ms:>9.1f} {speedup:>7.1f}x "
+              f"{error:>14.1f} {iou:>9.3f} {stats['missed']:>7} {stats['added']:>6}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test script for fused multi-method detection.
+This test verifies how detections of several methods are merged, and that a
+method missing its deadline is left out instead of delaying the result and is
+not started again while its earlier call is still running.
+"""
+
+import sys
+import os
+import time
+
+import cv2
+import numpy as np
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lego_robot_agent.detection import detect_fused, fuse_detections
+from lego_robot_agent.detection import fusion
+
+
+def detection(name, center, box, confidence=None, area=None, angle=0.0):
+    obj = {'name': name, 'center': center, 'bounding_box': box,
+           'area': area if area is not None else box[2] * box[3], 'orientation_angle': angle}
+    if confidence is not None:
+        obj['confidence'] = confidence
+    return obj
+
+
+def test_fuse_detections():
+    """Test merging, class mapping, confidence and measured shape of fused objects"""
+    results = {
+        'color': [detection('robot', (100, 100), (80, 80, 40, 40), area=1395.0, angle=105.4),
+                  detection('coke', (400, 300), (380, 280, 40, 40), area=1500.0, angle=12.0)],
+        'template': [detection('robot', (104, 100), (84, 80, 40, 40), confidence=0.9)],
+        'yolo': [detection('bottle', (402, 302), (382, 282, 40, 40), confidence=0.8),
+                 detection('bottle', (50, 500), (30, 480, 40, 40), confidence=0.3)],
+    }
+    fused = {obj['name']: obj for obj in fuse_detections(results, image_height=544)}
+    assert set(fused) == {'robot', 'coke'}, f"Expected robot and coke, got {set(fused)}"
+
+    robot = fused['robot']
+    assert robot['methods'] == ['color', 'template'], "Robot should merge color and template"
+    assert abs(robot['confidence'] - (1 - 0.4 * 0.1)) < 1e-6, "Confidence should be 1 - prod(1 - c)"
+    assert robot['center'] == (round((100 * 0.6 + 104 * 0.9) / 1.5), 100), "Center should be confidence-weighted"
+    assert robot['coordinates_2d'] == (robot['center'][0], 544 - 100), "2D coordinates should flip y"
+    assert robot['bounding_box'] == (84, 80, 40, 40), "Box should come from the most confident member"
+    assert robot['orientation_angle'] == 105.4 and robot['area'] == 1395.0, \
+        "Orientation and area should come from the color contour"
+
+    coke = fused['coke']
+    assert coke['methods'] == ['color', 'yolo'], "COCO 'bottle' should map to coke and merge with color"
+    assert coke['orientation_angle'] == 12.0, "Coke orientation should come from the color contour"
+
+    # Without a shape-measuring member the best member's values are used
+    fused = fuse_detections({'template': results['template']}, image_height=544)
+    assert fused[0]['area'] == 1600 and fused[0]['orientation_angle'] == 0.0, "Template-only shape should be kept"
+
+    # A lower weight lets the other method's box win
+    fused = fuse_detections(results, image_height=544, weights={'template': 0.5})
+    robot = [obj for obj in fused if obj['name'] == 'robot'][0]
+    assert robot['bounding_box'] == (80, 80, 40, 40), "Weighted color should become the best member"
+
+    print("✓ Fuse detections test passed")
+    return True
+
+
+def make_field(width, height):
+    frame = np.full((height, width, 3), 128, dtype=np.uint8)
+    scale = width / 960
+    for (x, y), color in (((200, 200), (200, 180, 60)), ((500, 300), (30, 30, 200))):
+        cv2.rectangle(frame, (int((x - 30) * scale), int((y - 30) * scale)),
+                      (int((x + 30) * scale), int((y + 30) * scale)), color, -1)
+    return frame
+
+
+def test_method_timeouts():
+    """Test that a method missing its deadline is reported and left out"""
+    small = make_field(960, 544)
+    objects, report = detect_fused(small, {'color': {}, 'template': {'templates': []}})
+    assert report['color']['status'] == 'ok' and report['template']['status'] == 'ok', f"Unexpected report {report}"
+    assert {obj['name'] for obj in objects} == {'robot', 'coke'}, "Color detections should be fused"
+    assert all(obj['methods'] == ['color'] for obj in objects), "Only color found objects"
+
+    large = make_field(4000, 3000)
+    started = time.perf_counter()
+    objects, report = detect_fused(large, {'color': {}, 'template': {'templates': []}},
+                                   timeouts={'color': 0.001, 'template': 2.0})
+    elapsed = time.perf_counter() - started
+    print(f"  Report: {report}")
+    assert report['color']['status'] == 'timeout', "Color should miss a 1 ms deadline on a 12 MP frame"
+    assert report['template']['status'] == 'ok', "Template should finish in time"
+    assert objects == [], "A timed-out method must not contribute objects"
+    assert list(report) == ['color', 'template'], "Report should be in config order"
+    assert elapsed < 1.0, f"Fused detection should not wait for the timed-out method ({elapsed:.2f} s)"
+
+    # The timed-out call keeps running; until it is done color is skipped, not queued behind it
+    running = fusion._in_flight['color']
+    objects, report = detect_fused(small, {'color': {}})
+    if not running.done():
+        assert report['color']['status'] == 'skipped', f"A busy method should be skipped, got {report}"
+        assert objects == [], "A skipped method must not contribute objects"
+    running.result()
+    objects, report = detect_fused(small, {'color': {}})
+    assert report['color']['status'] == 'ok', "Color should run again once its earlier call is done"
+
+    print("✓ Method timeouts test passed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n=== Fused Detection Tests ===\n")
+    
+    tests = [
+        ("Fuse Detections", test_fuse_detections),
+        ("Method Timeouts", test_method_timeouts),
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test_name, test_func in tests:
+        print(f"Running: {test_name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"✗ Test failed with exception: {e}")
+            failed += 1
+        print()
+    
+    print(f"=== Test Results ===")
+    print(f"Passed: {passed}/{len(tests)}")
+    print(f"Failed: {failed}/{len(tests)}")
+    
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Test script for the local detection service.
+This test starts the service with one worker and verifies request validation,
+results equal to in-process detection, and recovery after a timed-out request.
+"""
+
+import sys
+import os
+import asyncio
+import contextlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+
+import cv2
+import requests
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lego_robot_agent.detection import run_detection
+from lego_robot_agent.detection.service import (DEFAULT_CLIENT_TIMEOUT, DEFAULT_REQUEST_TIMEOUT, TOKEN_HEADER,
+                                                DetectionService, create_server, detect_remote)
+from lego_robot_agent.models import RoboProcessArgs
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'sample', 'step1.jpg')
+TOKEN = 'test-token'
+
+
+class ServiceFixture:
+    """One-worker service on a free local port."""
+
+    def __init__(self):
+        self.frames_dir = tempfile.mkdtemp(prefix='detection_frames_')
+        shutil.copy(SAMPLE_IMAGE, os.path.join(self.frames_dir, 'step1.jpg'))
+        self.service = DetectionService(workers=1)
+        self.server = create_server(self.service, TOKEN, port=0, frames_dir=self.frames_dir, request_timeout=30.0)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def post(self, path='/detect', token=TOKEN, **kwargs):
+        headers = kwargs.pop('headers', {})
+        if token is not None:
+            headers[TOKEN_HEADER] = token
+        return requests.post(self.url + path, headers=headers, timeout=30, **kwargs)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.service.close()
+        shutil.rmtree(self.frames_dir, ignore_errors=True)
+
+
+_fixture = None
+
+
+def service_fixture() -> ServiceFixture:
+    """The service shared by the tests, started on first use."""
+    global _fixture
+    if _fixture is None:
+        _fixture = ServiceFixture()
+    return _fixture
+
+
+def teardown_module():
+    """Stop the shared service (called by pytest after the last test, and by main)."""
+    global _fixture
+    if _fixture is not None:
+        _fixture.close()
+        _fixture = None
+
+
+def sample_missing() -> bool:
+    if not os.path.exists(SAMPLE_IMAGE):
+        print(f"⚠ Warning: Sample image not found at {SAMPLE_IMAGE}, skipping service test")
+        return True
+    return False
+
+
+def local_analysis():
+    args = RoboProcessArgs()
+    args.image_path = SAMPLE_IMAGE
+    args.no_display = True
+    args.artifacts = 'none'
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis = run_detection(args)
+    # As it comes back from JSON
+    return json.loads(json.dumps(analysis))
+
+
+def test_request_validation():
+    """Test that unauthenticated, malformed and out-of-scope requests are rejected"""
+    if sample_missing():
+        return True
+    fixture = service_fixture()
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = f.read()
+    octet = {'Content-Type': 'application/octet-stream'}
+
+    checks = [
+        (fixture.post(token=None, data=data, headers=dict(octet)), 401, "missing token"),
+        (fixture.post(token='wrong', data=data, headers=dict(octet)), 401, "wrong token"),
+        (fixture.post(data=data, headers={'Content-Type': 'text/plain'}), 415, "text/plain body"),
+        (fixture.post(json={'image_path': 'step1.jpg', 'options': {'output': '/tmp/x.json'}}), 400, "artifact path option"),
+        (fixture.post(json={'image_path': 'step1.jpg', 'options': {'yolo_model': '/tmp/x.pt'}}), 400, "model path option"),
+        (fixture.post(json={'image_path': SAMPLE_IMAGE}), 403, "path outside the frames directory"),
+        (fixture.post(json={'image_path': '../step1.jpg'}), 403, "path escaping the frames directory"),
+        (fixture.post(json={}), 400, "request without a frame"),
+        (fixture.post('/other', data=data, headers=dict(octet)), 404, "unknown endpoint"),
+    ]
+    for response, status, description in checks:
+        assert response.status_code == status, \
+            f"Expected {status} for {description}, got {response.status_code}: {response.text}"
+
+    health = requests.get(fixture.url + '/health', timeout=10).json()
+    assert health['status'] == 'ok' and health['workers'] == 1, f"Unexpected health {health}"
+
+    print("✓ Request validation test passed")
+    return True
+
+
+def test_results_match_local():
+    """Test that service results equal in-process detection and are stored by the caller"""
+    if sample_missing():
+        return True
+    fixture = service_fixture()
+    expected = local_analysis()
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = f.read()
+
+    response = fixture.post(json={'image_path': 'step1.jpg', 'visualize': True})
+    assert response.status_code == 200, f"Frame reference failed: {response.text}"
+    assert response.json()['analysis'] == expected, "Frame reference result should equal local detection"
+    assert response.json()['visualization'], "A visualization should be returned when asked for"
+
+    output_dir = tempfile.mkdtemp(prefix='detection_results_')
+    try:
+        output = os.path.join(output_dir, 'analysis.json')
+        visualize = os.path.join(output_dir, 'analysis.jpg')
+        analysis = asyncio.run(detect_remote(fixture.url, data, options={'cache': True}, token=TOKEN,
+                                             output=output, visualize=visualize, timeout=30))
+        assert analysis == expected, "Image body result should equal local detection"
+        with open(output) as f:
+            assert json.load(f) == expected, "The caller should store the analysis"
+        image = cv2.imread(visualize)
+        assert image is not None and image.shape[:2] == (544, 960), "The caller should store the visualization"
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    print("✓ Results match local test passed")
+    return True
+
+
+def test_timeout_recovery():
+    """Test that a timed-out detection frees its worker for the next request"""
+    if sample_missing():
+        return True
+    fixture = service_fixture()
+    image = cv2.imread(SAMPLE_IMAGE)
+    large = cv2.imencode('.png', cv2.resize(image, (4000, 3000)))[1].tobytes()
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = f.read()
+    octet = {'Content-Type': 'application/octet-stream'}
+
+    assert DEFAULT_REQUEST_TIMEOUT < DEFAULT_CLIENT_TIMEOUT, "The service should give up before its clients"
+
+    fixture.server.request_timeout = 0.05
+    response = fixture.post(data=large, headers=dict(octet))
+    assert response.status_code == 504, f"A 12 MP frame should time out, got {response.status_code}"
+
+    # The stuck worker is replaced; the next frame is served as soon as the new one is up
+    fixture.server.request_timeout = 30.0
+    response = fixture.post(data=data, headers=dict(octet))
+    assert response.status_code == 200, f"The next request should succeed, got {response.status_code}: {response.text}"
+    print(f"  Served after timeout in {response.headers['X-Elapsed-Ms']} ms")
+
+    # The client gives up on its own deadline
+    try:
+        asyncio.run(detect_remote(fixture.url, large, token=TOKEN, timeout=0.01))
+        assert False, "detect_remote should raise on its timeout"
+    except asyncio.TimeoutError:
+        pass
+
+    print("✓ Timeout recovery test passed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n=== Detection Service Tests ===\n")
+
+    tests = [
+        ("Request Validation", test_request_validation),
+        ("Results Match Local", test_results_match_local),
+        ("Timeout Recovery", test_timeout_recovery),
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    try:
+        for test_name, test_func in tests:
+            print(f"Running: {test_name}")
+            try:
+                if test_func():
+                    passed += 1
+                else:
+                    failed += 1
+            except Exception as e:
+                print(f"✗ Test failed with exception: {e}")
+                failed += 1
+            print()
+    finally:
+        teardown_module()
+    
+    print(f"=== Test Results ===")
+    print(f"Passed: {passed}/{len(tests)}")
+    print(f"Failed: {failed}/{len(tests)}")
+    
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for columnar detection results.
+This test verifies that a DetectionResult gives back the detector's objects and
+analysis with their original types, keeps contours packed, serializes to JSON
+and cannot be changed once built.
+"""
+
+import sys
+import os
+import json
+
+import cv2
+import numpy as np
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lego_robot_agent.detection import DetectionResult, DistanceMatrix, ObjectDetector, create_sample_color_ranges
+
+
+def make_frame():
+    """Synthetic 960x544 field with a blue robot, a red coke and a yellow bowser marker."""
+    frame = np.full((544, 960, 3), 128, dtype=np.uint8)
+    for (x, y), color in (((200, 200), (200, 180, 60)), ((300, 400), (30, 30, 200)), ((800, 100), (40, 180, 180))):
+        cv2.rectangle(frame, (x - 30, y - 30), (x + 30, y + 30), color, -1)
+    return frame
+
+
+def dict_analysis(objects, image_size, pixels_per_unit=1.0):
+    """The analysis as built from the per-object dicts."""
+    positions = [obj['coordinates_2d'] for obj in objects]
+    matrix = DistanceMatrix([obj['name'] for obj in objects], positions, pixels_per_unit)
+    return {
+        'image_dimensions': image_size,
+        'coordinate_system': '2D with origin at bottom-left, y-axis pointing up',
+        'objects': [{
+            'id': i,
+            'name': obj['name'],
+            'position_2d': obj['coordinates_2d'],
+            'center_pixels': obj['center'],
+            'area_pixels': obj['area'],
+            'orientation_degrees': obj['orientation_angle'],
+        } for i, obj in enumerate(objects)],
+        'distances': matrix.pair_entries(None, None, positions),
+    }
+
+
+def test_round_trip():
+    """Test that objects and analysis come back unchanged, types included"""
+    detector = ObjectDetector()
+    detector.set_image(make_frame())
+    objects = detector.detect_objects_by_color(create_sample_color_ranges())
+    # A template-style detection reports int area and angle
+    objects.append({'name': 'object_1', 'center': (500, 300), 'coordinates_2d': (500, 244),
+                    'bounding_box': (480, 280, 40, 40), 'area': 1600, 'orientation_angle': 0,
+                    'confidence': 0.9, 'detection_method': 'template'})
+    detector.detected_objects = objects
+    image_size = (detector.image_width, detector.image_height)
+
+    result = detector.get_detection_result()
+    assert len(result) == len(objects), f"Expected {len(objects)} objects, got {len(result)}"
+
+    for original, restored in zip(objects, result.to_objects()):
+        expected = {key: value for key, value in original.items() if key != 'contour'}
+        assert restored == expected, f"Round trip changed {original['name']}: {restored}"
+        for key in ('area', 'orientation_angle'):
+            assert type(restored[key]) is type(original[key]), f"{key} of {original['name']} changed type"
+
+    analysis = result.analysis(2.0)
+    assert json.dumps(analysis) == json.dumps(dict_analysis(objects, image_size, 2.0)), \
+        "Analysis should match the one built from the dicts"
+    assert json.dumps(detector.get_object_analysis(2.0)) == json.dumps(analysis), \
+        "get_object_analysis should give the result's analysis"
+
+    print("✓ Round trip test passed")
+    return True
+
+
+def test_contours_and_serialization():
+    """Test packed contours, the columnar JSON view and read-only columns"""
+    detector = ObjectDetector()
+    detector.set_image(make_frame())
+    objects = detector.detect_objects_by_color(create_sample_color_ranges())
+
+    result = detector.get_detection_result()
+    for index, obj in enumerate(objects):
+        assert np.array_equal(result.contour(index), obj['contour']), f"Contour of {obj['name']} changed"
+    assert detector.get_detection_result(keep_contours=False).contour(0) is None, "Contours should be left out"
+    assert result.index_of('coke') == [obj['name'] for obj in objects].index('coke'), "index_of should find coke"
+
+    data = json.loads(result.to_json())
+    assert data == json.loads(json.dumps(result.to_dict())), "to_json should serialize to_dict"
+    assert data['names'] == [obj['name'] for obj in objects], "Names should be kept in order"
+    assert data['coordinates_2d'] == [list(obj['coordinates_2d']) for obj in objects], "Coordinates should match"
+    assert data['confidences'] == [None] * len(objects), "Color detections have no confidence"
+
+    try:
+        result.areas[0] = 0
+        assert False, "Columns must be read-only"
+    except ValueError:
+        pass
+
+    empty = DetectionResult.empty((960, 544))
+    assert len(empty) == 0 and empty.to_dict()['names'] == [], "An empty result should serialize"
+    assert 'error' in empty.analysis(), "An empty result has no distances"
+
+    print(f"  {len(result)} objects in {result.nbytes} bytes")
+    print("✓ Contours and serialization test passed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n=== Detection Result Tests ===\n")
+
+    tests = [
+        ("Round Trip", test_round_trip),
+        ("Contours and Serialization", test_contours_and_serialization),
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test_name, test_func in tests:
+        print(f"Running: {test_name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"✗ Test failed with exception: {e}")
+            failed += 1
+        print()
+
+    print(f"=== Test Results ===")
+    print(f"Passed: {passed}/{len(tests)}")
+    print(f"Failed: {failed}/{len(tests)}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
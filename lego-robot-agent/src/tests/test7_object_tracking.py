@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental object tracking.
+This test verifies that tracked objects keep their IDs, are found in their search
+windows after small moves, and fall back to full detection when they are lost.
+"""
+
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lego_robot_agent.detection import ObjectTracker, create_sample_color_ranges
+from lego_robot_agent.detection.tracker import Track
+
+
+def make_frame(robot_at, coke_at=(300, 400), bowser_at=(800, 100)):
+    """Synthetic 960x544 field with a blue robot, a red coke and a yellow bowser marker."""
+    frame = np.full((544, 960, 3), 128, dtype=np.uint8)
+    for (x, y), color in ((robot_at, (200, 180, 60)), (coke_at, (30, 30, 200)), (bowser_at, (40, 180, 180))):
+        cv2.rectangle(frame, (x - 30, y - 30), (x + 30, y + 30), color, -1)
+    return frame
+
+
+def test_window_tracking():
+    """Test that small moves are tracked in search windows with stable IDs"""
+    tracker = ObjectTracker(create_sample_color_ranges())
+
+    first = {obj['name']: obj for obj in tracker.update(make_frame((200, 200)), timestamp=0.0)}
+    if set(first) != {'robot', 'coke', 'bowser'}:
+        print(f"✗ Expected robot, coke and bowser, got {set(first)}")
+        return False
+    assert all(obj['tracking'] == 'full' for obj in first.values()), "First update must be a full detection"
+
+    second = {obj['name']: obj for obj in tracker.update(make_frame((230, 180)), motion={'robot': (30, -20)}, timestamp=1.0)}
+    assert all(obj['tracking'] == 'window' for obj in second.values()), "Small move should be tracked in windows"
+    for name in first:
+        assert second[name]['track_id'] == first[name]['track_id'], f"Track ID of {name} changed"
+
+    vx, vy = second['robot']['velocity']
+    print(f"  Robot velocity: ({vx:.1f}, {vy:.1f}) px/s")
+    assert abs(vx - 30) <= 2 and abs(vy + 20) <= 2, "Robot velocity should be about (30, -20) px/s"
+
+    assert len(tracker.history) == 2, "Every update should be kept in the history"
+    latest = tracker.history[-1]
+    assert latest.timestamp == 1.0, "History entries should carry the frame timestamp"
+    assert latest.track_ids[latest.index_of('robot')] == first['robot']['track_id'], "History should keep track IDs"
+
+    print("✓ Window tracking test passed")
+    return True
+
+
+def test_fallback_on_loss():
+    """Test that a lost object triggers a full detection and keeps its track"""
+    tracker = ObjectTracker(create_sample_color_ranges())
+    first = {obj['name']: obj for obj in tracker.update(make_frame((200, 200)), timestamp=0.0)}
+
+    # Jump far outside the search window without a motion hint
+    moved = {obj['name']: obj for obj in tracker.update(make_frame((600, 450)), timestamp=1.0)}
+    assert moved['robot']['tracking'] == 'full', "Lost object should trigger a full detection"
+    assert moved['robot']['track_id'] == first['robot']['track_id'], "Robot should keep its track ID"
+    assert abs(moved['robot']['center'][0] - 600) <= 2, "Robot should be found at its new position"
+
+    print("✓ Fallback on loss test passed")
+    return True
+
+
+def test_commanded_motion_prediction():
+    """Test that a commanded move replaces the velocity prediction instead of adding to it"""
+    robot = {'name': 'robot', 'center': (230, 230)}
+    track = Track(1, robot, (200, 200, 60, 60), timestamp=1.0)
+    track.velocity = (30.0, 0.0)
+
+    assert track.search_window(2.0, None, 0) == (200, 170, 320, 290), "Without a command the velocity predicts the move"
+    assert track.search_window(2.0, (30, -20), 0) == (200, 150, 320, 270), "A command must not be added to the velocity"
+
+    print("✓ Commanded motion prediction test passed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n=== Object Tracker Tests ===\n")
+    
+    tests = [
+        ("Window Tracking", test_window_tracking),
+        ("Fallback On Loss", test_fallback_on_loss),
+        ("Commanded Motion Prediction", test_commanded_motion_prediction),
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test_name, test_func in tests:
+        print(f"Running: {test_name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"✗ Test failed with exception: {e}")
+            failed += 1
+        print()
+    
+    print(f"=== Test Results ===")
+    print(f"Passed: {passed}/{len(tests)}")
+    print(f"Failed: {failed}/{len(tests)}")
+    
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
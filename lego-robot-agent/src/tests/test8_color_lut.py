@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for single-pass color segmentation.
+This test verifies that the color lookup table gives exactly the masks of one
+cv2.inRange per color range, and that mask cleanup matches cv2.medianBlur.
+"""
+
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lego_robot_agent.detection import create_sample_color_ranges
+from lego_robot_agent.detection.segmentation import ColorLUT, clean_masks, get_color_lut
+
+
+def in_range_masks(image, color_ranges):
+    return [cv2.inRange(image, np.array(cr['lower']), np.array(cr['upper'])) for cr in color_ranges]
+
+
+def test_lut_matches_in_range():
+    """Test that LUT masks equal cv2.inRange masks pixel for pixel"""
+    color_ranges = create_sample_color_ranges()
+    # Overlapping ranges must set both class bits
+    color_ranges.append({'name': 'overlap', 'lower': [0, 0, 90], 'upper': [150, 150, 255]})
+    lut = ColorLUT(color_ranges)
+
+    rng = np.random.default_rng(7)
+    images = [rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)]
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sample = cv2.imread(os.path.join(script_dir, '..', '..', '..', 'sample', 'step1.jpg'))
+    if sample is not None:
+        images.append(sample)
+        # A crop is a non-contiguous view, as used for search windows
+        images.append(sample[100:300, 200:500])
+
+    scratch = {}
+    for image in images:
+        expected = in_range_masks(image, color_ranges)
+        for masks in (lut.segment(image), lut.segment(image, scratch)):
+            for name, mask, reference in zip(lut.names, masks, expected):
+                if not np.array_equal(mask, reference):
+                    print(f"✗ Mask of '{name}' differs from cv2.inRange on {image.shape}")
+                    return False
+
+    print(f"  Compared {len(color_ranges)} classes on {len(images)} images")
+    print("✓ LUT vs inRange test passed")
+    return True
+
+
+def test_lut_cache_and_limits():
+    """Test that LUTs are cached per config and that too many classes are rejected"""
+    color_ranges = create_sample_color_ranges()
+    assert get_color_lut(color_ranges) is get_color_lut(create_sample_color_ranges()), "Same config should reuse the LUT"
+    changed = [dict(cr) for cr in color_ranges]
+    changed[0]['upper'] = [255, 255, 255]
+    assert get_color_lut(changed) is not get_color_lut(color_ranges), "A changed range should build a new LUT"
+
+    try:
+        ColorLUT([{'name': str(i), 'lower': [0, 0, 0], 'upper': [1, 1, 1]} for i in range(9)])
+        print("✗ More than 8 classes should be rejected")
+        return False
+    except ValueError:
+        pass
+
+    print("✓ LUT cache and limits test passed")
+    return True
+
+
+def test_majority_blur_matches_median():
+    """Test that the box-count majority filter equals cv2.medianBlur on binary masks"""
+    rng = np.random.default_rng(3)
+    mask = np.where(rng.random((200, 240)) > 0.6, 255, 0).astype(np.uint8)
+    kernel = np.ones((3, 3), np.uint8)
+    opened = cv2.morphologyEx(cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel), cv2.MORPH_CLOSE, kernel)
+
+    for blur_size in (7, 9):
+        cleaned = clean_masks([mask], 3, blur_size)[0]
+        if not np.array_equal(cleaned, cv2.medianBlur(opened, blur_size)):
+            print(f"✗ Majority blur of size {blur_size} differs from cv2.medianBlur")
+            return False
+
+    print("✓ Majority blur test passed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n=== Color LUT Tests ===\n")
+    
+    tests = [
+        ("LUT Matches inRange", test_lut_matches_in_range),
+        ("LUT Cache And Limits", test_lut_cache_and_limits),
+        ("Majority Blur Matches Median", test_majority_blur_matches_median),
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test_name, test_func in tests:
+        print(f"Running: {test_name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"✗ Test failed with exception: {e}")
+            failed += 1
+        print()
+    
+    print(f"=== Test Results ===")
+    print(f"Passed: {passed}/{len(tests)}")
+    print(f"Failed: {failed}/{len(tests)}")
+    
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
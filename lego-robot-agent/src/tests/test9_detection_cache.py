@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Test script for the frame-keyed detection cache.
+This test verifies that identical and visually unchanged frames hit the cache,
+that changed frames and configs miss it, and that cached results are read-only.
+"""
+
+import sys
+import os
+import contextlib
+import io
+
+import cv2
+import numpy as np
+
+# Add the parent directory to the path so we can import the module
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lego_robot_agent.detection import DetectionCache, DetectionResult, clear_detection_cache, run_detection
+from lego_robot_agent.detection import fusion
+from lego_robot_agent.detection.cache import config_key, data_digest, frame_signature
+from lego_robot_agent.models import RoboProcessArgs
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'sample')
+
+
+def make_frame(offset=0):
+    frame = np.full((360, 480, 3), 128, dtype=np.uint8)
+    cv2.rectangle(frame, (100 + offset, 100), (160 + offset, 160), (200, 180, 60), -1)
+    return frame
+
+
+def test_cache_matching():
+    """Test digest and signature matching, tolerance, config keys and eviction"""
+    cache = DetectionCache(max_entries=2, tolerance=6)
+    key = config_key({'method': 'color'})
+    frame = make_frame()
+    data = cv2.imencode('.png', frame)[1].tobytes()
+    objects = [{'name': 'robot', 'center': (130, 130), 'bounding_box': (100, 100, 61, 61), 'area': 3721.0,
+                'orientation_angle': 90.0}]
+    result = DetectionResult.from_objects(objects, (480, 360))
+    cache.store(key, data_digest(data), frame_signature(frame), result)
+
+    assert cache.find(key, digest=data_digest(data)) is not None, "Identical bytes should hit by digest"
+    assert cache.find(config_key({'method': 'yolo'}), digest=data_digest(data)) is None, "Another config should miss"
+
+    noisy = cv2.add(frame, np.full(frame.shape, 2, dtype=np.uint8))
+    assert cache.find(key, digest=data_digest(b'other'), signature=frame_signature(noisy)) is not None, \
+        "A slightly brighter frame should hit by signature"
+    assert cache.find(key, signature=frame_signature(noisy), tolerance=1) is None, "A tighter tolerance should miss"
+    assert cache.find(key, signature=frame_signature(make_frame(offset=80))) is None, "A moved object should miss"
+
+    # Results are shared, so callers cannot change the cached entry
+    cached = cache.find(key, digest=data_digest(data)).result
+    assert cached is result, "The cached result should be handed out without copying"
+    try:
+        cached.centers[0, 0] = 0
+        assert False, "Cached results must be read-only"
+    except ValueError:
+        pass
+
+    cache.store(key, b'second', None, DetectionResult.empty())
+    cache.store(key, b'third', None, DetectionResult.empty())
+    assert cache.find(key, digest=data_digest(data)) is None, "The least recently used entry should be evicted"
+    assert cache.find(key, digest=b'third') is not None, "The newest entry should be kept"
+
+    print("✓ Cache matching test passed")
+    return True
+
+
+def detect(data, **options):
+    args = RoboProcessArgs()
+    for name, value in options.items():
+        setattr(args, name, value)
+    args.image_data = data
+    args.no_display = True
+    args.artifacts = 'none'
+    args.cache = True
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        analysis = run_detection(args)
+    return analysis, 'Detection cache hit' in output.getvalue()
+
+
+def test_run_detection_cache():
+    """Test that run_detection reuses results for the same scene only"""
+    step1 = os.path.join(SAMPLE_DIR, 'step1.jpg')
+    step2 = os.path.join(SAMPLE_DIR, 'step2.jpg')
+    if not (os.path.exists(step1) and os.path.exists(step2)):
+        print("⚠ Warning: Sample images not found, skipping run_detection cache test")
+        return True
+
+    clear_detection_cache()
+    with open(step1, 'rb') as f:
+        data = f.read()
+    reencoded = cv2.imencode('.jpg', cv2.imread(step1), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    with open(step2, 'rb') as f:
+        other = f.read()
+
+    first, hit = detect(data)
+    assert not hit, "The first detection should miss"
+    again, hit = detect(data)
+    assert hit and again == first, "The same bytes should hit with the same analysis"
+    again, hit = detect(reencoded)
+    assert hit and again == first, "A re-encoded photo of the same scene should hit"
+    _, hit = detect(other)
+    assert not hit, "A different scene should miss"
+
+    clear_detection_cache()
+    _, hit = detect(data)
+    assert not hit, "A cleared cache should miss"
+
+    print("✓ run_detection cache test passed")
+    return True
+
+
+def test_incomplete_fused_not_cached():
+    """Test that a fused run missing a method is not cached and timeouts are part of the key"""
+    step1 = os.path.join(SAMPLE_DIR, 'step1.jpg')
+    if not os.path.exists(step1):
+        print("⚠ Warning: Sample image not found, skipping fused cache test")
+        return True
+
+    clear_detection_cache()
+    # Large enough that color detection cannot finish within a zero timeout
+    frame = cv2.resize(cv2.imread(step1), (4000, 2266))
+
+    _, hit = detect(frame, method='fused', method_timeouts={'color': 0.0})
+    assert not hit, "The first detection should miss"
+    _, hit = detect(frame, method='fused', method_timeouts={'color': 0.0})
+    assert not hit, "A run where a method timed out should not be cached"
+
+    # A method is skipped until its timed-out call is done
+    for future in list(fusion._in_flight.values()):
+        future.result()
+
+    _, hit = detect(frame, method='fused')
+    assert not hit, "Other timeouts should use another cache key"
+    _, hit = detect(frame, method='fused')
+    assert hit, "A complete fused run should be cached"
+
+    clear_detection_cache()
+    print("✓ Incomplete fused cache test passed")
+    return True
+
+
+def main():
+    """Run all tests"""
+    print("\n=== Detection Cache Tests ===\n")
+    
+    tests = [
+        ("Cache Matching", test_cache_matching),
+        ("run_detection Cache", test_run_detection_cache),
+        ("Incomplete Fused Not Cached", test_incomplete_fused_not_cached),
+    ]
+    
+    passed = 0
+    failed = 0
+    
+    for test_name, test_func in tests:
+        print(f"Running: {test_name}")
+        try:
+            if test_func():
+                passed += 1
+            else:
+                failed += 1
+        except Exception as e:
+            print(f"✗ Test failed with exception: {e}")
+            failed += 1
+        print()
+    
+    print(f"=== Test Results ===")
+    print(f"Passed: {passed}/{len(tests)}")
+    print(f"Failed: {failed}/{len(tests)}")
+    
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())